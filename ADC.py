@@ -17,7 +17,9 @@ class ADC:
 
     def read_data(self, brd="SS_ADC1"):
         self.bus.select_spi(brd)
-        time.sleep(0.1)
+        self.bus.settle.require("adc", 0.1)
+        # the reading depends on everything set before (DAC, mux, ADC select)
+        self.bus.settle.wait()
         data = self.read_24bit_int()
         return data
 
@@ -43,26 +43,29 @@ class DAC70501:
             msg = msg + str(i) + ","
         msg = msg[:-1]
         # print(msg)
+        # chip select lines have to be stable and the previous write settled
+        self.bus.settle.wait("spi", "dac")
         self.bus.send_spi_msc(msg=msg)
-        time.sleep(0.1)
+        self.bus.settle.require("dac", 0.1)
         return
 
     def send_data(self, brd, reg, msg):
         if brd == "ES":
             self.bus.select_spi("ES_DAC")
-            time.sleep(0.01)
+            self.bus.settle.require("spi", 0.01)
             msg = msg | self.Register[reg]
             self.send_24bit_int(msg)
         elif brd == "SS":
             self.bus.select_spi("SS_DAC")
-            time.sleep(0.01)
+            self.bus.settle.require("spi", 0.01)
             msg = msg | self.Register[reg]
             self.send_24bit_int(msg)
         return
 
     def init(self, brd):
+        # pre_on declares the power-up time, the DAC can only be written after it
         self.bus.pre_on(1)
-        time.sleep(0.4)
+        self.bus.settle.wait("power")
         self.soft_reset(brd)
         self.div_gain(brd, self.dev, self.gain)
         # self.send_data(brd, "SYNC", 0x00)
@@ -102,7 +105,6 @@ if __name__ == "__main__":
 
     for k in brd:
         MUX.set_ch(k)
-        time.sleep(0.1)
         print(k[:2])
         for i in msg:
             DAC.send_data(k[:2], "DAC_DATA", int(i) << 2)
@@ -110,7 +112,6 @@ if __name__ == "__main__":
             data = sh.voltage_divider_pre(data[0])
             print("DAC value {:f} {:s}".format((int(i) * 2.5 / DAC.width), hex(i)))
             print(sh.rms(data))
-            time.sleep(0.2)
 
     # MUX.set_ch("ES_VGAIN")
     # DAC.send_data("ES", "DAC_DATA", 0x7fff<<1)
@@ -42,7 +42,7 @@ class Attenuator:
         if self.bus.i2cAddress != self.i2cAddress:
             self.bus.i2cAddress = self.i2cAddress
             self.bus.set_i2cAddress(self.i2cAddress)
-            time.sleep(0.1)
+            self.bus.settle.require("i2c", 0.1)
         return
 
 
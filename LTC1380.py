@@ -30,6 +30,7 @@ class LTC1380:
         value = self.CH[ch]
         value |= self.ON
         self.bus.write_byte_data_b(reg=0, regValue=value)
+        self.bus.settle.require("mux", 0.1)
         return
 
     def ch_off(self):
@@ -40,7 +41,7 @@ class LTC1380:
         if self.bus.i2cAddress != self.i2cAddress:
             self.bus.i2cAddress = self.i2cAddress
             self.bus.set_i2cAddress(self.i2cAddress)
-            time.sleep(0.1)
+            self.bus.settle.require("i2c", 0.1)
         return
 
 
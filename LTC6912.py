@@ -4,6 +4,8 @@ import sys
 import time
 import numpy as np
 import signal_helper as sh
+from multitone import Multitone
+from tone import capture, tone_level
 
 
 class LTC6912:
@@ -22,26 +24,36 @@ class LTC6912:
         self.brd_dict = dict(map(lambda i, j: (i, j), self.brd, self.F))
 
     def send_8bit_int(self, i):
+        self.bus.settle.wait("amp")
         self.bus.send_spi_msc1(msg=str(i))
-        time.sleep(0.2)
+        self.bus.settle.require("amp", 0.2)
+        self.bus.settle.wait("amp")
         self.bus.send_spi_msc1(msg=str(i))
-        time.sleep(0.2)
+        self.bus.settle.require("amp", 0.2)
         return
 
-    def test_db(self, vin):
+    def test_db(self, vin, freq=None):
+        """Level of every gain step, result_dict {gain dB: RMS}.
+        With freq, the generator frequency, only the tone at freq is measured
+        (lock-in) on one short capture instead of the broadband RMS of the
+        settled capture.
+        """
         result_dict = {}
         for k, v in self.GAIN.items():
             if k in ("0", "6", "12", "18.1", "24.1", "30.1"):
                 print("Gain db", k)
                 print("gain V ", v)
                 self.send_8bit_int(v)
-                data = self.read_same_level()
-                result = sh.rms(data)
-                print("RMS", result)
-                result = sh.ratio_db(result, vin)
+                if freq is None:
+                    rms = sh.rms(self.read_same_level())
+                else:
+                    data = capture(self.bus, freq)
+                    rms = tone_level(data, freq, self.bus.fs, sh.PRE_DIVIDER)["rms"]
+                print("RMS", rms)
+                result = sh.ratio_db(rms, vin)
                 print("Ratio", result)
                 if k in ("0", "6", "12", "18.1", "24.1", "30.1"):
-                    result_dict[k] = round(sh.rms(data), 3)
+                    result_dict[k] = round(rms, 3)
         return result_dict
 
     def find_gain(self, vin, width, pattern):
@@ -63,29 +75,43 @@ class LTC6912:
 
         return result_dict
 
+    def measure_gain_map(self, vin, freq):
+        """Gain in dB of every GAIN1 x GAIN1 register value, {register: dB}.
+        dB is ratio_db(rms, vin) as in find_gain, negative for amplification,
+        measured with the lock-in at the generator frequency freq like the
+        PRE board tests. Stored for a reference board by gaincal.GainMap.
+        """
+        gains = {}
+        for v in self.GAIN1.values():
+            for n in self.GAIN1.values():
+                self.send_8bit_int(v << 4 | n)
+                rms = tone_level(capture(self.bus, freq), freq, self.bus.fs, sh.PRE_DIVIDER)["rms"]
+                gains[v << 4 | n] = round(float(sh.ratio_db(rms, vin)), 3)
+        return gains
+
     def brd_id(self, ampl):
-        for i in self.F:
-            rp_c.set_gen(wave_form="sine", freq=i, ampl=ampl)
-            data = AMP.read_same_level(thresh=0.1)
-            brd_rms.append(round(sh.rms(data), 3))
+        # all id frequencies from one capture
+        tones = Multitone(self.F, self.bus.fs)
+        tones.play(self.bus, ampl)
+        data = sh.voltage_divider_pre(tones.capture(self.bus))
+        brd_rms = np.round(tones.rms(data), 3)
         return self.brd[np.argmax(brd_rms)]
 
-    def read_same_level(self, thresh=0.01, slice=100):
-        sub = 1
-        cnt = 0
-        while sub >= thresh:
-            data = []
-            data = self.bus.read_now()
-            # data = self.bus.read_oneL0()
-            data = sh.voltage_divider_pre(data[0])
-            # max_start = np.max(data[0:slice])
-            # max_ende = np.max(data[-slice:-1])
-            max_start = sh.rms(data[0:slice])
-            max_ende = sh.rms(data[-slice:-1])
-            sub = round(abs(max_start - max_ende), 3)
-            cnt += 1
-            if cnt == 10:
-                return -1
+    def read_same_level(self, thresh=0.01, slice=100, min_len=4096, tries=10):
+        """Settled part of a capture, divider corrected.
+
+        The windowed RMS (window of slice samples) of the whole capture is checked
+        in one pass, only the region where it stays within thresh of its final
+        level is returned. A new capture is taken only when that region is
+        shorter than min_len samples, after tries captures the last one is
+        returned as it is.
+        """
+        for i in range(tries):
+            data = sh.voltage_divider_pre(self.bus.read_now()[0])
+            region = sh.settled_region(data, thresh, slice, min_len)
+            if region is not None:
+                return data[region]
+        print(f"LTC6912 >> level not settled after {tries} captures")
         return data
 
 
@@ -94,6 +120,8 @@ if __name__ == "__main__":
     import time, sys
     from LTC1380 import LTC1380
     from DAT31R5A import Attenuator
+    from corner import find_corner, gen_level, print_log
+    from gaincal import GainMap
     import signal_helper as sh
 
     dec = 32
@@ -113,7 +141,6 @@ if __name__ == "__main__":
     brd_rms = []
 
     MUX.set_ch("ES_MAIN")
-    time.sleep(0.1)
     rp_c.gen_on(1)
     rp_c.adc1_2(1)
     rp_c.ss_gl(0)
@@ -127,6 +154,9 @@ if __name__ == "__main__":
     rp_c.set_gen(wave_form="sine", freq=AMP.brd_dict[current_brd], ampl=ampl)
     # db_s = AMP.find_gain(vin, 2 ,60)
 
+    if 0:  # gain map of a reference board, used by PRE_TESTs for reporting
+        GainMap(AMP).calibrate(current_brd, vin, AMP.brd_dict[current_brd])
+
     BRD_setting = {
         #    main -6db -6db lim -3bd -3db
         "18": [10000.0, 51000.0, 10000.0, 56000.0],
@@ -140,27 +170,23 @@ if __name__ == "__main__":
         ratio60 = sh.ratio_db(rms60, vin)
         print("Ratio 60", ratio60)
 
+        # attenuation against mid band at f
+        measure = gen_level(
+            rp_c,
+            lambda: sh.ratio_db(sh.rms(AMP.read_same_level(thresh=0.05, slice=100)), vin) - ratio60,
+            ampl=ampl,
+            settle=0.5,
+        )
+        f_mid = AMP.brd_dict[current_brd]
         for i in (0, 1):
             start_F = BRD_setting[current_brd][i]
-            while 1:
-                print(".", end="", flush=True)
-                rp_c.set_gen(wave_form="sine", freq=start_F, ampl=ampl)
-                time.sleep(0.5)
-                data = AMP.read_same_level(thresh=0.05, slice=100)
-                rms = sh.rms(data)
-                ratio = sh.ratio_db(rms, vin)
-                sub = ratio60 - ratio
-                # print(start_F,"ratio",ratio, sub)
-                error = sh.checking_width(0.1, 6, abs(sub))
-                if not error:
-                    print("")
-                    print("frequency", start_F, "ratio", ratio, sub)
-                    break
-                start_F += 100
+            bracket = (start_F, f_mid) if i == 0 else (start_F, 2 * start_F)
+            corner, log = find_corner(measure, 6, *bracket, tol=100, db_tol=0.1)
+            print_log(log)
+            print("frequency", corner, "steps", len(log))
 
     if 1:  # search for F-low and F-high amplifier limiter
         MUX.set_ch("ES_LIM")
-        time.sleep(0.1)
         ATT.set_loss(int(30))
         rp_c.ss_gl(1)
         vin = (
@@ -174,22 +200,18 @@ if __name__ == "__main__":
 
         print(f'{format(rmsLIM, ".3f"):5}', "Ratio LIM", ratioLIM)
 
+        measure = gen_level(
+            rp_c,
+            lambda: sh.ratio_db(sh.rms(AMP.read_same_level(thresh=0.05, slice=100)), vin) - ratioLIM,
+            ampl=ampl,
+            settle=0.2,
+        )
+        f_mid = AMP.brd_dict[current_brd]
         for i in (2, 3):
             start_F = BRD_setting[current_brd][i]
-            while 1:
-                print(".", end="", flush=True)
-                rp_c.set_gen(wave_form="sine", freq=start_F, ampl=ampl)
-                time.sleep(0.2)
-                data = AMP.read_same_level(thresh=0.05, slice=100)
-                rms = sh.rms(data)
-                ratio = sh.ratio_db(rms, vin)
-                sub = ratioLIM - ratio
-                # print(start_F,"ratio",f'{ratio:.3f}', f'{sub:.3f}')
-                error = sh.checking_width(0.5, 6, abs(sub))
-                if not error:
-                    print("")
-                    print("frequency", start_F, "ratio", f"{ratio:.3f}", f"{sub:.3f}")
-                    break
-                start_F += 50.0
+            bracket = (start_F, f_mid) if i == 2 else (start_F, 2 * start_F)
+            corner, log = find_corner(measure, 6, *bracket, tol=50, db_tol=0.5)
+            print_log(log)
+            print("frequency", corner, "steps", len(log))
 
     rp_c.pre_on(0)
@@ -17,24 +17,28 @@ if __name__ == "__main__":
 
     # print(f"Sample rate: {sample_rate}, Buffer time: {buffTime} , Duration: {duration}")
     frequencies = [250e3, 500e3]
-    t, signal = sh.gen_signals_sequence(frequencies, duration=duration, sample_rate=sample_rate)
-    rp_c.gen_on(1)
+    # one AWG buffer holding the whole sequence
+    t, signal = sh.gen_signals_sequence(
+        frequencies, duration=duration, sample_rate=sample_rate, size=rp_c.buffSize
+    )
 
-    # rp_c.arbitrary(signal, duration=buffTime,ch=1, ampl=0.5)
+    # the buffer holds the whole sequence, played once per len(frequencies) * duration
+    rp_c.arbitrary(signal, duration=len(frequencies) * duration, ch=1, ampl=0.5)
+    rp_c.gen_on(1)
 
     # for i in range(2):
     #     rp_c.set_gen(wave_form="sine", freq=frequencies[i], ampl=ampl)
     #     time.sleep(0.5)
 
-    rp_c.set_gen(wave_form="sine", freq=frequencies[0], ampl=0.5)
-    rp_c.gen_on(1)
+    # rp_c.set_gen(wave_form="sine", freq=frequencies[0], ampl=0.5)
+    # rp_c.gen_on(1)
     
 
 
 
     # Power on
     rp_c.set_power(1)
-    rp_c.set_gen(wave_form="sine", freq=frequencies[1], ampl=1.0)
+    # rp_c.set_gen(wave_form="sine", freq=frequencies[1], ampl=1.0)
     # turn on the RX relay
     rp_c.rx_on(1)
 
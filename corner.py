@@ -0,0 +1,92 @@
+"""Corner frequency search.
+
+find_corner brackets the frequency where a measured level crosses a target
+(e.g. 6 dB below mid band) and closes in with secant steps on the dB curve
+over log(f), keeping the corner bracketed all the time. A corner to 10 Hz
+takes about ten generator retunes instead of hundreds of 50/100 Hz steps.
+
+    read = lambda: sh.ratio_db(sh.rms(AMP.read_same_level()), vin) - ratio60
+    f, log = find_corner(gen_level(rp_c, read, ampl=0.1), 6, 10e3, 26e3, tol=10)
+"""
+
+import numpy as np
+
+
+def gen_level(rp_c, read, ampl=0.1, wave_form="sine", settle=0.2):
+    """measure(f) for find_corner: tune the generator to f, let it settle and return read()."""
+
+    def measure(f):
+        rp_c.set_gen(wave_form=wave_form, freq=f, ampl=ampl)
+        rp_c.settle.require("gen", settle)
+        return read()
+
+    return measure
+
+
+def find_corner(measure, target, f_a, f_b, tol=10.0, db_tol=0.0, max_steps=40, widen=1.5):
+    """Frequency between f_a and f_b where measure(f) equals target (dB).
+
+    parameters:
+        measure   - f -> level in dB
+        target    - level to find, e.g. 3 or 6 dB attenuation
+        f_a, f_b  - initial bracket, widened by the factor widen while the
+                    target is not between the two levels
+        tol       - stop when the bracket is narrower than tol Hz
+        db_tol    - stop when a level is closer than db_tol to the target
+        max_steps - maximum number of measurements
+
+    Returns (frequency, log), log holds one (f, level, step) tuple per measurement.
+    Raises ValueError when the target cannot be bracketed within max_steps.
+    """
+    log = []
+
+    def m(f, step):
+        level = measure(f)
+        log.append((f, level, step))
+        return level - target
+
+    a, b = min(f_a, f_b), max(f_a, f_b)
+    ya, yb = m(a, "bracket"), m(b, "bracket")
+    while ya * yb > 0:
+        if len(log) >= max_steps:
+            raise ValueError(f"target {target} dB not bracketed in {a:.1f}..{b:.1f} Hz")
+        # move the end closer to the target outwards
+        if abs(ya) < abs(yb):
+            a, b, yb = a / widen, a, ya
+            ya = m(a, "bracket")
+        else:
+            a, b, ya = b, b * widen, yb
+            yb = m(b, "bracket")
+
+    # false position on log(f), the dB slopes of a filter are close to straight there;
+    # the Illinois rule halves the level of an end that stays put twice so both ends converge
+    side = 0
+    while b - a > tol and len(log) < max_steps:
+        la, lb = np.log(a), np.log(b)
+        f = np.exp(lb - yb * (lb - la) / (yb - ya))
+        step = "secant"
+        if not a < f < b:
+            f = (a + b) / 2
+            step = "bisect"
+        y = m(f, step)
+        if abs(y) <= db_tol or y == 0:
+            return float(f), log
+        if (y > 0) == (ya > 0):
+            a, ya = f, y
+            if side == -1:
+                yb /= 2
+            side = -1
+        else:
+            b, yb = f, y
+            if side == 1:
+                ya /= 2
+            side = 1
+
+    # interpolate inside the final bracket
+    la, lb = np.log(a), np.log(b)
+    return float(np.exp(lb - yb * (lb - la) / (yb - ya))), log
+
+
+def print_log(log):
+    for i, (f, level, step) in enumerate(log):
+        print(f"{i:3d} {step:<8} {f:12.1f} Hz {level:8.3f} dB")
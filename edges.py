@@ -0,0 +1,97 @@
+"""Threshold edges with hysteresis, for a whole capture or chunk by chunk.
+
+The signal is high from the first sample >= hi on and low from the first
+sample < lo on, samples between lo and hi keep the state, so noise around
+a single threshold does not chatter. Edges are the indices of the first
+sample in the new state. The state is carried over between calls, a long
+recording can be fed in blocks (e.g. from RedCtl.stream) without losing
+edges at the block seams:
+
+    det = EdgeDetector(hi=0.25, lo=0.15, min_width=20)
+    for block in s.blocks(100):
+        rising, falling = det(block[0])     # indices from the first block on
+"""
+
+import numpy as np
+
+EMPTY = np.zeros(0, dtype=np.int64)
+
+
+class EdgeDetector:
+    """Rising and falling edges of a 1-D signal.
+
+    parameters:
+        hi        - rising threshold
+        lo        - falling threshold, hi by default (no hysteresis)
+        min_width - high pulses shorter than min_width samples are dropped
+                    with both of their edges
+        state     - state before the first sample, None takes it from the
+                    first sample outside lo..hi (no edge there)
+
+    A rising edge is returned once its pulse is min_width samples long, so it
+    may come with a later chunk than the one it lies in.
+    """
+
+    def __init__(self, hi, lo=None, min_width=0, state=None):
+        self.hi = hi
+        self.lo = hi if lo is None else lo
+        if self.lo > self.hi:
+            raise ValueError(f"lo {self.lo} above hi {self.hi}")
+        self.min_width = min_width
+        self.initial = state
+        self.reset()
+
+    def reset(self):
+        self.state = self.initial
+        self.offset = 0
+        self.open = None  # rising edge of an unconfirmed pulse
+
+    def __call__(self, chunk):
+        """(rising, falling) int64 index arrays counted from the first sample fed."""
+        x = np.asarray(chunk)
+        start, end = self.offset, self.offset + len(x)
+        self.offset = end
+
+        high = x >= self.hi
+        events = np.flatnonzero(high | (x < self.lo))
+        if events.size == 0:
+            return self._confirm(EMPTY, EMPTY, end)
+        value = high[events]
+        if self.state is None:
+            self.state = bool(value[0])
+        change = value != np.concatenate(([self.state], value[:-1]))
+        self.state = bool(value[-1])
+        idx = events[change] + start
+        kind = value[change]
+        return self._confirm(idx[kind], idx[~kind], end)
+
+    def _confirm(self, rising, falling, end):
+        """Apply min_width, carry an unconfirmed pulse into the next call."""
+        w = self.min_width
+        head_r, head_f = EMPTY, EMPTY
+        if falling.size and (rising.size == 0 or falling[0] < rising[0]):
+            # the first falling edge ends a pulse from before this chunk
+            if self.open is None:
+                head_f = falling[:1]
+            elif falling[0] - self.open >= w:
+                head_r, head_f = np.array([self.open]), falling[:1]
+            self.open = None
+            falling = falling[1:]
+        elif self.open is not None:
+            if end - self.open >= w:
+                head_r = np.array([self.open])
+                self.open = None
+
+        # edges alternate, rising[i] < falling[i]
+        k = falling.size
+        keep = falling - rising[:k] >= w
+        tail_r = EMPTY
+        if rising.size > k:
+            if end - rising[-1] >= w:
+                tail_r = rising[-1:]
+            else:
+                self.open = int(rising[-1])
+        return (
+            np.concatenate((head_r, rising[:k][keep], tail_r)).astype(np.int64),
+            np.concatenate((head_f, falling[keep])).astype(np.int64),
+        )
@@ -0,0 +1,78 @@
+"""Pulse features of captures, all peaks or edges of a batch in one pass.
+
+The functions take a capture (samples,) or a batch (..., samples) and return
+one structured array record per peak or edge, row is the flat index of the
+capture in the batch:
+
+    f = peak_features(block, width=700, delta=1000)
+    f["left_min"], f["right_min"], f["peak"], f["level"]
+
+    e = edge_levels(block, thresh=0.2, width=20)
+    e["level"].mean()
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import find_peaks
+
+PEAK_DTYPE = np.dtype(
+    [("row", np.int64), ("left_min", np.int64), ("right_min", np.int64), ("peak", np.int64), ("level", np.float64)]
+)
+EDGE_DTYPE = np.dtype([("row", np.int64), ("edge", np.int64), ("level", np.float64)])
+
+
+def _rows(y):
+    y = np.asarray(y, dtype=float)
+    return y.reshape(-1, y.shape[-1])
+
+
+def peak_features(y, width=700, delta=1000):
+    """Minima around the peaks of y wider than width samples.
+
+    For every peak i > delta, left_min is i - argmin(y[i - delta:i]) and
+    right_min is i + argmin(y[i:i + delta]), the first minimum of each side.
+    level is the peak value.
+    """
+    rows = _rows(y)
+    found = [find_peaks(r, width=width)[0] for r in rows]
+    row = np.repeat(np.arange(len(rows)), [len(p) for p in found])
+    peak = np.concatenate(found).astype(np.int64) if found else np.zeros(0, np.int64)
+    keep = peak > delta
+    row, peak = row[keep], peak[keep]
+
+    # right windows may run past the end, the padding never wins argmin
+    padded = np.pad(rows, ((0, 0), (0, delta - 1)), constant_values=np.inf)
+    windows = sliding_window_view(padded, delta, axis=1)
+
+    out = np.empty(len(peak), dtype=PEAK_DTYPE)
+    out["row"] = row
+    out["left_min"] = peak - np.argmin(windows[row, peak - delta], axis=1)
+    out["right_min"] = peak + np.argmin(windows[row, peak], axis=1)
+    out["peak"] = peak
+    out["level"] = rows[row, peak]
+    return out
+
+
+def edge_levels(voltage, thresh=0.2, width=20):
+    """Level before every falling edge through thresh.
+
+    level is the mean of voltage[i - 2 * width:i - width] before the edge at i,
+    edges where voltage[i - 2 * width] is not above 0 or which are closer than
+    2 * width to the start are left out.
+    """
+    rows = _rows(voltage)
+    row, edge = np.nonzero((rows[:, :-1] > thresh) & (rows[:, 1:] < thresh))
+    edge = edge + 1
+    keep = edge >= 2 * width
+    row, edge = row[keep], edge[keep]
+    keep = rows[row, edge - 2 * width] > 0
+    row, edge = row[keep], edge[keep]
+
+    # window sums from one cumulative sum per row
+    c = np.zeros((len(rows), rows.shape[1] + 1))
+    np.cumsum(rows, axis=1, out=c[:, 1:])
+    out = np.empty(len(edge), dtype=EDGE_DTYPE)
+    out["row"] = row
+    out["edge"] = edge
+    out["level"] = (c[row, edge - width] - c[row, edge - 2 * width]) / width
+    return out
@@ -0,0 +1,116 @@
+"""Frequency response from one chirp capture.
+
+The generator plays a linear chirp (RedCtl.chirp / signal_helper.chirp_l),
+the stimulus is captured on CH2 and the board output on CH1 of the same
+trigger. H(f) is the ratio of the two spectra, gain at any frequency and the
+-3 dB / -6 dB corners are read from it without retuning the generator:
+
+    fr = FreqResponse(rp_c).measure(f_min=10e3, f_max=300e3, ampl=0.1)
+    fr.gain(60e3)
+    fr.corners(drop=6)
+"""
+
+import numpy as np
+import signal_helper as sh
+
+
+class FreqResponse:
+    """Chirp based frequency response of the board between two inputs.
+
+    parameters:
+        rp_c      - RedCtl
+        out_ch    - channel with the board output
+        in_ch     - channel with the stimulus
+        smooth    - spectral averaging width in bins
+        threshold - bins whose stimulus is below threshold * max are dropped
+    """
+
+    def __init__(self, rp_c, out_ch=1, in_ch=2, smooth=8, threshold=0.1):
+        self.rp_c = rp_c
+        self.out_ch = out_ch
+        self.in_ch = in_ch
+        self.smooth = smooth
+        self.threshold = threshold
+        self.f = None
+        self.H = None
+
+    def measure(self, f_min, f_max, duration=None, ampl=0.1, phi=270):
+        """Play a chirp from f_min to f_max and compute H(f) from one capture.
+        duration of one sweep defaults to the capture length so a full sweep is acquired.
+        """
+        rp_c = self.rp_c
+        if duration is None:
+            duration = rp_c.buffTime
+        rp_c.chirp(phi=phi, f_min=f_min, f_max=f_max, duration=duration, ampl=ampl)
+        rp_c.settle.require("gen", duration)
+        data = rp_c.read_window(
+            -rp_c.buffTime / 2, rp_c.buffTime / 2, channels=(self.out_ch, self.in_ch), trig="NOW"
+        )
+        return self.compute(data[0], data[1], rp_c.fs, f_min, f_max)
+
+    def compute(self, y, x, fs, f_min=0.0, f_max=None):
+        """H(f) of output y over input x sampled at fs, limited to f_min..f_max."""
+        # no window, the sweep maps time to frequency and a window would
+        # suppress the ends of the band; one sweep per capture is periodic
+        Y = np.fft.rfft(y)
+        X = np.fft.rfft(x)
+        f = np.fft.rfftfreq(len(x), 1 / fs)
+
+        # H1 estimate, cross and auto spectra averaged over neighbouring bins
+        k = np.ones(self.smooth) / self.smooth
+        Sxy = np.convolve(Y * np.conj(X), k, mode="same")
+        Sxx = np.convolve(np.abs(X) ** 2, k, mode="same")
+
+        band = (f >= f_min) & (f <= (f_max if f_max is not None else fs / 2))
+        band &= Sxx > self.threshold * np.max(Sxx[band])
+        self.f = f[band]
+        self.H = Sxy[band] / Sxx[band]
+        return self
+
+    @property
+    def gain_db(self):
+        return sh.div_db(np.abs(self.H))
+
+    @property
+    def phase(self):
+        return np.unwrap(np.angle(self.H))
+
+    def gain(self, freq):
+        """Gain in dB at freq (scalar or array), interpolated between bins."""
+        return np.interp(freq, self.f, self.gain_db)
+
+    def corners(self, drop=3.0, ref=None):
+        """(f_low, f_high) where the gain falls drop dB below the reference.
+
+        ref is the reference frequency, the maximum of the response by default.
+        A corner outside of the measured band is None.
+        """
+        g = self.gain_db
+        if ref is None:
+            peak = int(np.argmax(g))
+        else:
+            peak = int(np.argmin(np.abs(self.f - ref)))
+        level = g[peak] - drop
+
+        below = np.flatnonzero(g[:peak] < level)
+        f_low = None
+        if below.size:
+            i = below[-1]
+            f_low = np.interp(level, [g[i], g[i + 1]], [self.f[i], self.f[i + 1]])
+
+        above = np.flatnonzero(g[peak:] < level)
+        f_high = None
+        if above.size:
+            i = peak + above[0]
+            f_high = np.interp(level, [g[i], g[i - 1]], [self.f[i], self.f[i - 1]])
+        return f_low, f_high
+
+
+if __name__ == "__main__":
+    import redpctl as redpctl
+
+    rp_c = redpctl.RedCtl(dec=8)
+    fr = FreqResponse(rp_c).measure(f_min=10e3, f_max=300e3, ampl=0.1)
+    print("gain at 60 kHz", fr.gain(60e3))
+    print("-3 dB", fr.corners(drop=3))
+    print("-6 dB", fr.corners(drop=6))
@@ -0,0 +1,181 @@
+"""LTC6912 gain map of a reference board.
+
+The gain of all 49 GAIN1 x GAIN1 register combinations is measured on a
+known good reference board of each board type, with the lock-in method of
+the board tests, and kept per station in dataset/gain_map.json. The board
+tests themselves stay on the spec registers; the map is for calibration and
+reporting, e.g. the deviation of a board from the reference at a register,
+or the register closest to a gain without a search:
+
+    cal = GainMap(AMP)
+    cal.calibrate("40", vin, 60e3)            # reference board on the station
+    ...
+    ref = cal.gain("40", 0x26, vin, 60e3)     # None without a valid map
+    reg = cal.lookup("40", -54.0, vin, 60e3)
+
+Gains are in the repo convention ratio_db(rms, vin), an amplification of
+54 dB is -54.0.
+
+An entry is valid for the station, input level and frequency it was measured
+with, for max_age seconds. The station ID is $REDPITAYA_STATION or the host
+name.
+"""
+
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+MAX_AGE = 30 * 24 * 3600.0
+
+# Station boards run in threads, each with its own GainMap on the same file
+_save_lock = threading.Lock()
+
+
+def station_id():
+    return os.environ.get("REDPITAYA_STATION") or socket.gethostname()
+
+
+class GainTable:
+    """Nearest register for a gain in dB, O(1) per lookup.
+
+    parameters:
+        gains      - {register: gain dB}, ratio_db(rms, vin)
+        resolution - dB step of the lookup table
+    """
+
+    def __init__(self, gains, resolution=0.01):
+        self.gains = {int(k): float(v) for k, v in gains.items()}
+        regs = np.array(list(self.gains))
+        db = np.array(list(self.gains.values()))
+        order = np.argsort(db)
+        self.regs, self.db = regs[order], db[order]
+        self.resolution = resolution
+        self.lo = self.db[0]
+
+        # midpoints between neighbouring gains split the table into nearest regions
+        grid = self.lo + np.arange(int(np.ceil((self.db[-1] - self.lo) / resolution)) + 1) * resolution
+        mid = (self.db[1:] + self.db[:-1]) / 2
+        self.table = np.searchsorted(mid, grid)
+
+    def index(self, db):
+        i = int(round((db - self.lo) / self.resolution))
+        return self.table[min(max(i, 0), len(self.table) - 1)]
+
+    def register(self, db):
+        """Register value whose gain is closest to db."""
+        return int(self.regs[self.index(db)])
+
+    def gain(self, db):
+        """Measured gain of the register closest to db."""
+        return float(self.db[self.index(db)])
+
+
+class GainMap:
+    """Persistent per board type and station gain maps of an LTC6912.
+
+    parameters:
+        amp     - LTC6912 driver, measures the map
+        path    - JSON cache file
+        station - station ID, station_id() by default
+        max_age - age in s after which an entry is recalibrated
+    """
+
+    def __init__(self, amp, path="dataset/gain_map.json", station=None, max_age=MAX_AGE):
+        self.amp = amp
+        self.path = path
+        self.station = station or station_id()
+        self.max_age = max_age
+        self.tables = {}
+        self.entries = self.load()
+        # keys changed or removed by this instance, merged into the file on save
+        self.changed = set()
+        self.removed = set()
+
+    def key(self, brd):
+        return f"{self.station}/{brd}"
+
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self):
+        """Merge the entries changed here into the file, entries of others are kept.
+        Written to a unique temporary file and renamed over the cache.
+        """
+        with _save_lock:
+            entries = self.load()
+            for key in self.removed:
+                entries.pop(key, None)
+            for key in self.changed:
+                entries[key] = self.entries[key]
+            with tempfile.NamedTemporaryFile(
+                "w", encoding="utf-8", dir=os.path.dirname(self.path) or ".", suffix=".tmp", delete=False
+            ) as f:
+                json.dump(entries, f, indent=1)
+            os.replace(f.name, self.path)
+            self.entries = entries
+            self.changed.clear()
+            self.removed.clear()
+
+    def valid(self, brd, vin, freq):
+        entry = self.entries.get(self.key(brd))
+        return (
+            entry is not None
+            and entry["station"] == self.station
+            and time.time() - entry["time"] < self.max_age
+            and np.isclose(entry["vin"], vin, rtol=1e-6, atol=0)
+            and np.isclose(entry.get("freq", np.nan), freq, rtol=1e-6, atol=0)
+        )
+
+    def calibrate(self, brd, vin, freq):
+        """Measure the map of the reference board of type brd and store it.
+        vin is the input level, freq the generator frequency of the lock-in.
+        """
+        gains = self.amp.measure_gain_map(vin, freq)
+        self.entries[self.key(brd)] = {
+            "station": self.station,
+            "brd": brd,
+            "time": time.time(),
+            "vin": vin,
+            "freq": freq,
+            "gains": {str(k): v for k, v in gains.items()},
+        }
+        self.changed.add(self.key(brd))
+        self.removed.discard(self.key(brd))
+        self.tables.pop(brd, None)
+        self.save()
+        return gains
+
+    def table(self, brd, vin, freq):
+        """GainTable of brd, KeyError without a valid map for vin and freq."""
+        if not self.valid(brd, vin, freq):
+            raise KeyError(f"no valid gain map for {self.key(brd)} at vin {vin}, {freq} Hz, calibrate first")
+        if brd not in self.tables:
+            self.tables[brd] = GainTable(self.entries[self.key(brd)]["gains"])
+        return self.tables[brd]
+
+    def lookup(self, brd, db, vin, freq):
+        """Register value closest to db (ratio_db(rms, vin)) on board type brd."""
+        return self.table(brd, vin, freq).register(db)
+
+    def gain(self, brd, register, vin, freq):
+        """Reference gain in dB of register on board type brd, None without a valid map."""
+        if not self.valid(brd, vin, freq):
+            return None
+        return self.table(brd, vin, freq).gains.get(int(register))
+
+    def invalidate(self, brd=None):
+        for key in [k for k in self.entries if brd is None or k == self.key(brd)]:
+            del self.entries[key]
+            self.removed.add(key)
+            self.changed.discard(key)
+        self.tables.clear()
+        self.save()
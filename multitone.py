@@ -0,0 +1,101 @@
+"""Multitone stimulus, several test frequencies from one capture.
+
+The tones are rounded to FFT bins of a full 16384 sample capture and the
+waveform is one period of the arbitrary generator buffer, so every tone is
+periodic in the generator and bin-centred in the capture. The phases are
+chosen for a low crest factor, all tone amplitudes come from one FFT:
+
+    tones = Multitone([26e3, 60e3, 150e3], rp_c.fs)
+    tones.play(rp_c, ampl=0.1)
+    rms = tones.rms(tones.capture(rp_c))
+"""
+
+import numpy as np
+
+
+def schroeder_phases(n):
+    return -np.pi * np.arange(n) * (np.arange(n) + 1) / n
+
+
+def newman_phases(n):
+    return np.pi * np.arange(n) ** 2 / n
+
+
+def crest_factor(x):
+    return np.max(np.abs(x)) / np.sqrt(np.mean(np.square(x)))
+
+
+class Multitone:
+    """Crest factor optimised sum of bin-centred cosines.
+
+    parameters:
+        freqs      - tone frequencies in Hz, rounded to multiples of fs / n
+        fs         - sampling frequency of the capture (RedCtl.fs)
+        n          - samples per generator period and capture
+        iterations - clipping iterations refining the phases
+    """
+
+    def __init__(self, freqs, fs, n=16384, iterations=50):
+        self.fs = fs
+        self.n = n
+        self.bins = np.round(np.asarray(freqs, dtype=float) * n / fs).astype(int)
+        if len(np.unique(self.bins)) != len(self.bins) or np.any(self.bins < 1):
+            raise ValueError(f"tones {freqs} do not fall into distinct bins of {fs / n} Hz")
+        self.freqs = self.bins * fs / n
+
+        # start from the better of the Schroeder and Newman phases
+        candidates = [self._wave(p) for p in (schroeder_phases, newman_phases)]
+        wave = min(candidates, key=crest_factor)
+        self.phases = self._refine(wave, iterations)
+        wave = self._wave(lambda k: self.phases)
+
+        # normalised to a peak of 1, each tone has amplitude `scale`
+        self.scale = 1 / np.max(np.abs(wave))
+        self.wave = wave * self.scale
+
+    def _wave(self, phases):
+        t = np.arange(self.n) / self.n
+        phi = phases(len(self.bins))
+        return np.cos(2 * np.pi * np.outer(self.bins, t) + phi[:, None]).sum(axis=0)
+
+    def _refine(self, wave, iterations):
+        """Clip the peaks, keep the phases of the tone bins, repeat."""
+        phases = np.angle(np.fft.rfft(wave)[self.bins])
+        for i in range(iterations):
+            limit = 0.9 * np.max(np.abs(wave))
+            spectrum = np.fft.rfft(np.clip(wave, -limit, limit))
+            trial = self._wave(lambda k, p=np.angle(spectrum[self.bins]): p)
+            if crest_factor(trial) >= crest_factor(wave):
+                break
+            wave = trial
+            phases = np.angle(spectrum[self.bins])
+        return phases
+
+    @property
+    def crest_factor(self):
+        return crest_factor(self.wave)
+
+    @property
+    def duration(self):
+        return self.n / self.fs
+
+    def play(self, rp_c, ampl=0.1):
+        """Upload the waveform once, every tone is played with amplitude ampl * scale."""
+        rp_c.arbitrary(self.wave, duration=self.duration, ampl=ampl)
+        rp_c.gen_on(1)
+        rp_c.settle.require("gen", self.duration)
+
+    def capture(self, rp_c, ch=1):
+        """One full buffer of ch, immediate trigger."""
+        if rp_c.fs != self.fs or rp_c.buffSize != self.n:
+            raise ValueError("capture does not match the multitone sampling")
+        return rp_c.read_window(-rp_c.buffTime / 2, rp_c.buffTime / 2, channels=(ch,), trig="NOW")[0]
+
+    def amplitudes(self, data):
+        """Peak amplitude of every tone, data is (..., n)."""
+        spectrum = np.fft.rfft(data, axis=-1)
+        return 2 * np.abs(spectrum[..., self.bins]) / self.n
+
+    def rms(self, data):
+        """RMS a single sine of the full amplitude would have produced at every tone."""
+        return self.amplitudes(data) / np.sqrt(2) / self.scale
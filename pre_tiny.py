@@ -5,6 +5,9 @@ import numpy as np
 from LTC1380 import LTC1380
 from DAT31R5A import Attenuator
 from LTC6912 import LTC6912
+from multitone import Multitone
+from tone import capture, tone_level
+from gaincal import GainMap
 
 import signal_helper as sh
 import pandas as pd
@@ -18,6 +21,7 @@ class PRE_TESTs:
         self.MUX = LTC1380(self.bus)
         self.ATT = Attenuator(self.bus)
         self.AMP = LTC6912(self.bus)
+        self.gain_map = GainMap(self.AMP)
         self.att_loss = 5.
         self.ATT.set_loss(int(self.att_loss))
 
@@ -74,6 +78,13 @@ class PRE_TESTs:
             "40": [0x66, 130000., 0x26, 26800.,103500., 60000.,25550.,124000.],
             "HS": [0x55, 300000., 0x26, 58700.,209700.,150000.,56850.,290300.],
         }
+
+    def report_reference(self, result, freq):
+        """Print the deviation from the reference board gain map, when there is one."""
+        ref = self.gain_map.gain(self.current_brd, self.BRD_setting[self.current_brd][2], self.vin, freq)
+        if ref is not None:
+            print(f"reference {ref:.3f} dB, deviation {result - ref:.3f} dB")
+
     def test(self, brd=None):
         if self.current == None:
             self.counter = 0
@@ -119,16 +130,16 @@ class PRE_TESTs:
         self.current_brd = None
         brd_rms = []
         self.MUX.set_ch("ES_MAIN")
-        time.sleep(0.1) 
         self.bus.gen_on(1)
         self.bus.adc1_2(1)
         self.bus.ss_gl(0)
         self.bus.pre_on(1)
         self.AMP.send_8bit_int(38)
-        for i in self.id_f:
-            self.bus.set_gen(wave_form="sine", freq=i, ampl=self.ampl)
-            data = self.AMP.read_same_level(thresh = 0.1)
-            brd_rms.append(round(sh.rms(data), 3))
+        # all id frequencies from one capture
+        tones = Multitone(self.id_f, self.bus.fs)
+        tones.play(self.bus, self.ampl)
+        data = sh.voltage_divider_pre(tones.capture(self.bus))
+        brd_rms = [round(float(i), 3) for i in tones.rms(data)]
         result= np.max(brd_rms)
         # print(brd_rms)
         self.error = self.check_result(result)
@@ -140,13 +151,12 @@ class PRE_TESTs:
         self.bus.gen_on(0)
         self.bus.ss_gl(1)
         self.AMP.send_8bit_int(self.BRD_setting[self.current_brd][0])
-        time.sleep(0.5)
+        self.bus.settle.require("amp", 0.5)
         # data = self.bus.read_oneL0()
         data = self.AMP.read_same_level(thresh = 0.05, slice = 100)
         y = sh.butter_lowpass_filter(
                     data, self.BRD_setting[self.current_brd][1], self.bus.fs, order=5)
-        data = sh.voltage_divider_pre(y)
-        result = sh.rms(data)
+        result = sh.levels(y, sh.PRE_DIVIDER)["rms"]
         self.error = self.check_result(result)
         self.df.loc[0, [self.current]] = [result]
         return self.print_tests(result)
@@ -155,15 +165,18 @@ class PRE_TESTs:
         self.rms60 = 0
         self.bus.set_gen(wave_form="sine", freq=self.BRD_setting[self.current_brd][5], ampl=self.ampl)
         self.bus.gen_on(1)
-        time.sleep(0.2)
+        self.bus.settle.require("gen", 0.2)
         self.bus.ss_gl(0)
         self.AMP.send_8bit_int(self.BRD_setting[self.current_brd][2])
-        time.sleep(0.5)
-        data = self.AMP.read_same_level(thresh = 0.05, slice = 100)
-        result = round(sh.rms(data),6)
+        self.bus.settle.require("amp", 0.5)
+        # lock-in at the generator frequency, a short capture is enough
+        freq = self.BRD_setting[self.current_brd][5]
+        data = capture(self.bus, freq)
+        result = round(tone_level(data, freq, self.bus.fs, sh.PRE_DIVIDER)["rms"],6)
         # print("brd db",result, self.vin)
         self.rms60 = result
         result = sh.ratio_db(result, self.vin)
+        self.report_reference(result, freq)
         self.error = self.check_result(result)
         self.df.loc[0, [self.current]] = [result]
         return self.print_tests(result)
@@ -173,27 +186,24 @@ class PRE_TESTs:
         self.bus.gen_on(1)
         self.bus.ss_gl(1)
         self.AMP.send_8bit_int(self.BRD_setting[self.current_brd][2])
-        time.sleep(0.2)
-        data = self.AMP.read_same_level(thresh = 0.05, slice = 100)
-        result = round(sh.ratio_db(sh.rms(data),self.vin),6)
+        self.bus.settle.require("amp", 0.2)
+        freq = self.BRD_setting[self.current_brd][5]
+        data = capture(self.bus, freq)
+        result = round(tone_level(data, freq, self.bus.fs, sh.PRE_DIVIDER, ref=self.vin)["db"],6)
         self.error = self.check_result(result)
         self.df.loc[0, [self.current]] = [result]
         return self.print_tests(result)
     
     def brd_bw(self):
-        result = []
-        for i in (5,3,4):
-            self.bus.set_gen(wave_form="sine", freq=self.BRD_setting[self.current_brd][i], ampl=self.ampl)
-            time.sleep(0.2)
-            self.bus.gen_on(1)
-            self.bus.ss_gl(0)
-            self.AMP.send_8bit_int(self.BRD_setting[self.current_brd][2])
-            time.sleep(0.2)
-            data = self.AMP.read_same_level(thresh = 0.05, slice = 100)
-            if result == []:
-                result.append(sh.ratio_db(sh.rms(data), self.vin))
-            else:
-                result.append(result[0] - sh.ratio_db(sh.rms(data), self.vin))
+        # mid band and both -6 dB points from one capture
+        tones = Multitone([self.BRD_setting[self.current_brd][i] for i in (5,3,4)], self.bus.fs)
+        tones.play(self.bus, self.ampl)
+        self.bus.ss_gl(0)
+        self.AMP.send_8bit_int(self.BRD_setting[self.current_brd][2])
+        self.bus.settle.require("amp", 0.2)
+        data = sh.voltage_divider_pre(tones.capture(self.bus))
+        db = [float(sh.ratio_db(i, self.vin)) for i in tones.rms(data)]
+        result = [db[0], db[0] - db[1], db[0] - db[2]]
         self.error = self.check_result(result)
         self.df.loc[0, [self.current]] = [result]
         return self.print_tests(result)
@@ -206,12 +216,13 @@ class PRE_TESTs:
         result = []
         for i in (5,6,7):
             self.bus.set_gen(wave_form="sine", freq=self.BRD_setting[self.current_brd][i], ampl=self.ampl)
-            time.sleep(0.5)
+            self.bus.settle.require("gen", 0.5)
             data = self.AMP.read_same_level(thresh = 0.05, slice = 100)
+            db = sh.levels(data, ref=self.vin)["db"]
             if result == []:
-                result.append(sh.ratio_db(sh.rms(data), self.vin))
+                result.append(db)
             else:
-                result.append(result[0] - sh.ratio_db(sh.rms(data), self.vin))
+                result.append(result[0] - db)
         self.error = self.check_result(result)
         self.df.loc[0, [self.current]] = [result]
         return self.print_tests(result)
@@ -321,6 +332,8 @@ if __name__ == "__main__":
                 break
 
         rp_c.pre_on(0)
+        print(rp_c.shadow_report())
+        print(rp_c.settle.report())
         # T.save_log()
 
         termios.tcflush(sys.stdin, termios.TCIOFLUSH)
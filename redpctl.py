@@ -1,4 +1,10 @@
 import redpitaya_scpi as scpi
+import redpitaya_async
+from shadow import ShadowState
+from trigger import TriggerWait
+from scpi_stats import ScpiStats
+from stream import AcqStream
+from settle import Settle
 import numpy as np
 import time
 import scipy
@@ -16,17 +22,30 @@ SSRinput_pin = "1"
 ESinput_pin = "2"
 SSLinput_pin = "3"
 
+# power-up time of the pre-amplifier board after P_ON
+POWER_SETTLE = 0.4
+
 
 class RedCtl:
     """RedPitaya ctrl class
     parameters:
     """
 
-    def __init__(self, ip="192.168.0.15", trig=0.2, dec=1, ch=1):
+    def __init__(
+        self, ip="192.168.0.15", trig=0.2, dec=1, ch=1, port=5000, aio=False, shadow=True
+    ):
 
         self.data = []
+        # block array reused by read_block
+        self._block = None
         self.ip = ip
-        self.rp_s = scpi.scpi(self.ip)
+        if aio:
+            # blocking facade over the asyncio client, boards share one event loop
+            self.rp_s = redpitaya_async.scpi_sync(self.ip, port=port)
+        else:
+            self.rp_s = scpi.scpi(self.ip, port=port)
+        # mirror of the board settings, repeated writes of the same value are dropped
+        self.rp_s.shadow = ShadowState() if shadow else None
         self.trig_lev = trig
         self.trig_ch = ch
         self.dec = dec
@@ -37,113 +56,147 @@ class RedCtl:
         self.buffTime = self.buffSize / self.fs  # Max acquisition time
         # self.Nsamples = int(self.fs * self.durationSeconds)
         self.i2cAddress = None
+        # settling deadlines declared by the drivers, captures wait for all of them
+        self.settle = Settle()
+        # every capture waits for trigger and fill through this poller
+        self.trigger = TriggerWait(self.rp_s, self.buffTime)
 
-        # disable all GPIO
-        self.rp_s.tx_txt("DIG:RST")
-        self.rp_s.tx_txt("ACQ:RST")
+        # the whole board setup goes out as one write
+        with self.rp_s.batch():
+            # disable all GPIO
+            self.rp_s.tx_txt("DIG:RST")
+            self.rp_s.tx_txt("ACQ:RST")
 
-        self.spi_init()
-        self.set_dir()
+            self.spi_init()
+            self.set_dir()
 
-        # self.rp_s.tx_txt("I2C:FMODE ON")
+            # self.rp_s.tx_txt("I2C:FMODE ON")
 
-        self.rp_s.tx_txt("ACQ:DATA:FORMAT ASCII")
-        self.rp_s.tx_txt("ACQ:DATA:UNITS VOLTS")
-        self.rp_s.tx_txt("ACQ:TRIG:DLY 0")
-        self.rp_s.tx_txt("ACQ:TRIG:LEV %d" % self.trig_lev)
+            self.rp_s.tx_txt("ACQ:DATA:FORMAT BIN")
+            self.rp_s.tx_txt("ACQ:DATA:UNITS VOLTS")
+            self.rp_s.tx_txt("ACQ:TRIG:DLY 0")
+            self.rp_s.tx_txt("ACQ:TRIG:LEV %d" % self.trig_lev)
 
     def read(self, quantity=800, counter=50):
-
+        """counter shots of both channels, returns the list [ch1, ch2, ch1, ch2 ...]
+        of views into the block array of read_block.
+        """
+        block = self.read_block(quantity, counter)
         self.data.clear()
-        self.rp_s.tx_txt("ACQ:DEC %d" % self.dec)
+        self.data.extend(block.reshape(-1, quantity))
+        return self.data
 
+    def _arm(self, trig=None):
+        self.settle.wait()
         self.rp_s.tx_txt("ACQ:START")
-        time.sleep(0.05)
-        self.rp_s.tx_txt("ACQ:TRIG CH%d_PE" % self.trig_ch)
+        # let the pre-trigger part of the buffer fill before arming the trigger
+        time.sleep(self.buffTime)
+        if trig is None:
+            trig = "CH%d_PE" % self.trig_ch
+        self.rp_s.tx_txt("ACQ:TRIG " + trig)
+
+    def read_block(self, quantity=800, counter=50, out=None, channels=(1, 2)):
+        """counter triggered shots of quantity samples per channel.
+
+        The shots are written into a (counter, len(channels), quantity) array,
+        out if given, otherwise an array kept by RedCtl and reused as long as
+        the shape does not change. The acquisition is re-armed for every shot.
+        """
+        shape = (counter, len(channels), quantity)
+        if out is None:
+            if self._block is None or self._block.shape != shape:
+                self._block = np.empty(shape, dtype=np.float32)
+            out = self._block
+        elif out.shape != shape:
+            raise ValueError(f"out must have shape {shape}")
 
+        self.rp_s.tx_txt("ACQ:DEC %d" % self.dec)
         for i in range(counter):
+            self._arm()
+            self.trigger.wait()
+            with self.rp_s.batch():
+                # all channels of the same trigger in one round trip
+                self.rp_s.acq_data_multi(channels, old=True, num_samples=quantity, out=out[i])
+                self.rp_s.tx_txt("ACQ:STOP")
+
+        return out
+
+    def stream(self, quantity=None, channels=(1, 2), slots=8, trig="NOW", threaded=True):
+        """Continuous acquisition, see stream.AcqStream."""
+        if quantity is None:
+            quantity = self.buffSize
+        return AcqStream(self, quantity, channels, slots, trig, threaded)
+
+    def read_window(self, t0, t1, channels=(1, 2), out=None, trig=None):
+        """One triggered capture, only the samples from t0 to t1 s around the trigger are read.
+
+        parameters:
+            t0, t1   - window relative to the trigger in s, with ACQ:TRIG:DLY 0
+                       both lie within -buffTime/2 ... buffTime/2
+            channels - acquired channels
+            out      - optional (len(channels), N) float32 array
+            trig     - trigger source, default CH<trig_ch>_PE
+
+        The trigger pointer is queried and the window is read with STA:N, split
+        in two reads where it wraps around the end of the buffer.
+        Returns the (len(channels), N) array.
+        """
+        start, num = self.window(t0, t1)
+        if out is None:
+            out = np.empty((len(channels), num), dtype=np.float32)
+        elif out.shape != (len(channels), num):
+            raise ValueError(f"out must have shape {(len(channels), num)}")
 
-            while 1:
-                self.rp_s.tx_txt("ACQ:TRIG:STAT?")
-                if self.rp_s.rx_txt() == "TD":
-                    break
-
-            while 1:
-                self.rp_s.tx_txt("ACQ:TRIG:FILL?")
-                if self.rp_s.rx_txt() == "1":
-                    break
-
-            self.rp_s.tx_txt("ACQ:SOUR1:DATA:OLD:N? " + str(quantity))
-
-            buff_string = self.rp_s.rx_txt()
-            buff_string = buff_string.strip("{}\n\r").replace("  ", "").split(",")
-            buff = list(map(float, buff_string))
-            arr = np.array(buff)
-            self.data.append(arr)
-
-            self.rp_s.tx_txt("ACQ:SOUR2:DATA:OLD:N? " + str(quantity))
-
-            buff_string = self.rp_s.rx_txt()
-            buff_string = buff_string.strip("{}\n\r").replace("  ", "").split(",")
-            buff = list(map(float, buff_string))
-            arr = np.array(buff)
-            self.data.append(arr)
-
-            # data = np.append(data,np.array(buff))
+        self.rp_s.tx_txt("ACQ:DEC %d" % self.dec)
+        self._arm(trig)
+        self.trigger.wait()
+        tpos = int(self.rp_s.txrx_txt("ACQ:TPOS?"))
+        start = (tpos + start) % self.buffSize
+        # samples up to the end of the buffer, the rest wraps around to 0
+        first = min(num, self.buffSize - start)
+        with self.rp_s.batch():
+            self.rp_s.acq_data_multi(channels, start=start, num_samples=first, out=out[:, :first])
+            if first < num:
+                self.rp_s.acq_data_multi(channels, start=0, num_samples=num - first, out=out[:, first:])
             self.rp_s.tx_txt("ACQ:STOP")
-
-        return self.data
+        return out
+
+    def window(self, t0, t1):
+        """(offset from the trigger pointer, number of samples) of a trigger window in s."""
+        half = self.buffSize // 2
+        offset = int(round(t0 * self.fs))
+        num = int(round(t1 * self.fs)) - offset
+        if num <= 0:
+            raise ValueError("window must end after it starts")
+        if offset < -half or offset + num > half:
+            raise ValueError(
+                f"window {t0}..{t1} s outside of the buffer "
+                f"({-self.buffTime / 2}..{self.buffTime / 2} s around the trigger)"
+            )
+        return offset, num
 
     def read_oneL0(self):
-
+        """First third of the buffer (oldest samples) of an immediate capture."""
         self.data.clear()
-        self.rp_s.tx_txt("ACQ:DEC %d" % self.dec)
-        # self.set_trig(trig_lev=0, ch=self.trig_ch)
-        self.rp_s.tx_txt("ACQ:START")
-        self.rp_s.tx_txt("ACQ:TRIG NOW")
-        # self.rp_s.tx_txt("ACQ:TRIG CH%d_PE" % self.trig_ch)
-
-        while 1:
-            self.rp_s.tx_txt("ACQ:TRIG:STAT?")
-            if self.rp_s.rx_txt() == "TD":
-                break
-
-        while 1:
-            self.rp_s.tx_txt("ACQ:TRIG:FILL?")
-            if self.rp_s.rx_txt() == "1":
-                break
-
-        buff = self.rp_s.acq_data(1, old=True, num_samples=16384 / 3, convert=True)
-        # self.rp_s.tx_txt("ACQ:SOUR1:DATA?")
-        # # self.rp_s.tx_txt("ACQ:SOUR1:DATA:OLD:N? 16384")
-        # buff_string = self.rp_s.rx_txt()
-        # buff_string = buff_string.strip("{}\n\r").replace("  ", "").split(",")
-        # buff = list(map(float, buff_string))
-        arr = np.array(buff)
-        self.data.append(arr)
-        self.rp_s.tx_txt("ACQ:STOP")
+        t0 = -self.buffTime / 2
+        window = self.read_window(t0, t0 + (self.buffSize // 3) / self.fs, channels=(1,), trig="NOW")
+        self.data.append(window[0])
         return self.data
 
     def read_now(self):
 
+        self.settle.wait()
         self.data.clear()
         self.rp_s.tx_txt("ACQ:DEC %d" % self.dec)
         self.rp_s.tx_txt("ACQ:START")
         self.rp_s.tx_txt("ACQ:TRIG NOW")
 
-        while 1:
-            self.rp_s.tx_txt("ACQ:TRIG:STAT?")
-            if self.rp_s.rx_txt() == "TD":
-                break
-
-        while 1:
-            self.rp_s.tx_txt("ACQ:TRIG:FILL?")
-            if self.rp_s.rx_txt() == "1":
-                break
+        self.trigger.wait()
 
-        buff = self.rp_s.acq_data(1, old=False, num_samples=16384, convert=True)
-        arr = np.array(buff)
-        self.data.append(arr)
+        buff = self.rp_s.acq_data(
+            1, old=False, num_samples=self.buffSize, binary=True, convert=True
+        )
+        self.data.append(buff)
         self.rp_s.tx_txt("ACQ:STOP")
         return self.data
 
@@ -154,13 +207,20 @@ class RedCtl:
 
     def set_dec(self, dec=1):
         self.dec = dec
+        self.fs = 125e6 / self.dec
+        self.buffTime = self.buffSize / self.fs
+        self.trigger.buffTime = self.buffTime
 
     def set_gen(self, wave_form="square", freq=500000, ampl=0.5):
         """wave form sine square"""
-        self.rp_s.tx_txt("GEN:RST")
-        self.rp_s.sour_set(1, wave_form, ampl, freq)
-        self.rp_s.tx_txt("OUTPUT1:STATE ON")
-        self.rp_s.tx_txt("SOUR1:TRIG:INT")
+        with self.rp_s.batch():
+            # a full reset is only needed while the generator state is unknown,
+            # otherwise the shadow lets only the changed settings through
+            if self.rp_s.shadow is None or not self.rp_s.shadow.known("SOUR1:FUNC"):
+                self.rp_s.tx_txt("GEN:RST")
+            self.rp_s.sour_set(1, wave_form, ampl, freq)
+            self.rp_s.tx_txt("OUTPUT1:STATE ON")
+            self.rp_s.tx_txt("SOUR1:TRIG:INT")
         # self.rp_s.close()
 
     def set_burst(
@@ -174,6 +234,9 @@ class RedCtl:
     ):
         # wave_form "sine" "square"
         self.rp_s.tx_txt("GEN:RST")
+        # the generator needs 2 s after the reset before it is triggered,
+        # the burst configuration below runs inside that time
+        self.settle.require("gen", 2)
         period = int(period * 1000000)
         ncyc = int(duration * freq)
 
@@ -182,21 +245,28 @@ class RedCtl:
         )
         self.gen_on(1)
         # self.rp_s.tx_txt("OUTPUT:STATE ON"
-        time.sleep(2)
+        self.settle.wait("gen")
         self.rp_s.tx_txt("SOUR1:TRIG:INT")
-        time.sleep(2)
+        # the second trigger has to come 2 s after the first, nothing to overlap
+        self.settle.require("gen", 2)
+        self.settle.wait("gen")
         self.rp_s.tx_txt("SOUR:TRIG:INT")
 
     def set_ch(self, ch, value=1, pol="N"):
-        for i in range(4):
-            self.rp_s.tx_txt("DIG:PIN DIO" + str(i) + "_" + pol + "," + str(0))
-        if ch != 0:
-            self.rp_s.tx_txt("DIG:PIN DIO" + str(ch) + "_" + pol + "," + str(value))
+        with self.rp_s.batch():
+            for i in range(4):
+                self.rp_s.tx_txt("DIG:PIN DIO" + str(i) + "_" + pol + "," + str(0))
+            if ch != 0:
+                self.rp_s.tx_txt("DIG:PIN DIO" + str(ch) + "_" + pol + "," + str(value))
 
     def set_power(self, value=1):
         self.rp_s.tx_txt("DIG:PIN DIO" + str(4) + "_N," + str(value))
 
     def pre_on(self, value=1):
+        shadow = self.rp_s.shadow
+        if value and (shadow is None or shadow.get("DIG:PIN DIO" + P_ON_pin + "_N") != str(value)):
+            # only a real power-up has to settle
+            self.settle.require("power", POWER_SETTLE)
         self.rp_s.tx_txt("DIG:PIN DIO" + P_ON_pin + "_N," + str(value))
 
     def es_ss(self, type="ES"):
@@ -230,8 +300,9 @@ class RedCtl:
         self.rp_s.tx_txt("DIG:PIN DIO" + ES_GL_pin + "_N," + str(value))
 
     def set_dir(self):
-        for i in range(6):
-            self.rp_s.tx_txt("DIG:PIN:DIR OUT,DIO" + str(i) + "_N")
+        with self.rp_s.batch():
+            for i in range(6):
+                self.rp_s.tx_txt("DIG:PIN:DIR OUT,DIO" + str(i) + "_N")
 
     def chirp(self, phi=270, f_min=600000, f_max=1000000, duration=0.00025, ampl=1):
         wave_form = "arbitrary"
@@ -244,11 +315,12 @@ class RedCtl:
             duration=duration,
             ampl=ampl,
         )
-        self.rp_s.tx_txt("GEN:RST")
-        self.rp_s.sour_set(1, wave_form, ampl, 1 / duration, data=x0)
-        self.gen_on(1)
-        # self.rp_s.tx_txt("OUTPUT:STATE ON")
-        self.rp_s.tx_txt("SOUR:TRIG:INT")
+        with self.rp_s.batch():
+            self.rp_s.tx_txt("GEN:RST")
+            self.rp_s.sour_set(1, wave_form, ampl, 1 / duration, data=x0)
+            self.gen_on(1)
+            # self.rp_s.tx_txt("OUTPUT:STATE ON")
+            self.rp_s.tx_txt("SOUR:TRIG:INT")
         return
 
     def gen_on(self, state=1):
@@ -264,55 +336,62 @@ class RedCtl:
             waveform_ch_10.append(f"{n:.5f}")
         waveform_ch_1 = ", ".join(map(str, waveform_ch_10))
         # z = ''
-        self.rp_s.tx_txt("GEN:RST")
         # for i, text in enumerate(data):
         #     z += str(text) + ', '
-        self.rp_s.tx_txt(("SOUR1:FUNC ARBITRARY").replace("1", str(ch), 1))
-        self.rp_s.tx_txt(
-            ("SOUR1:TRAC:DATA:DATA " + waveform_ch_1).replace("1", str(ch), 1)
-        )
-        self.rp_s.tx_txt(("SOUR1:FREQ:FIX " + str(freq)).replace("1", str(ch), 1))
-        self.rp_s.tx_txt(("SOUR1:VOLT " + str(ampl)).replace("1", str(ch), 1))
-        # self.rp_s.tx_txt("OUTPUT1:STATE ON")
-        self.rp_s.tx_txt("SOUR:TRIG:INT")
+        with self.rp_s.batch():
+            self.rp_s.tx_txt("GEN:RST")
+            self.rp_s.tx_txt(("SOUR1:FUNC ARBITRARY").replace("1", str(ch), 1))
+            self.rp_s.tx_txt(
+                ("SOUR1:TRAC:DATA:DATA " + waveform_ch_1).replace("1", str(ch), 1)
+            )
+            self.rp_s.tx_txt(("SOUR1:FREQ:FIX " + str(freq)).replace("1", str(ch), 1))
+            self.rp_s.tx_txt(("SOUR1:VOLT " + str(ampl)).replace("1", str(ch), 1))
+            # self.rp_s.tx_txt("OUTPUT1:STATE ON")
+            self.rp_s.tx_txt("SOUR:TRIG:INT")
         return
 
     def read_byte_data(self, i2cAddress=32, reg=0):
         self.set_i2cAddress(i2cAddress)
+        self.settle.wait("i2c")
         self.rp_s.tx_txt("I2C:Smbus:Read%d?" % reg)
         value = self.rp_s.rx_txt()
         value = int(value)
         return value
 
     def write_byte_data(self, i2cAddress=32, reg=0, regValue=0):
+        self.settle.wait("i2c")
         self.rp_s.tx_txt("I2C:Smbus:Write" + str(reg) + " " + str(regValue))
         return
 
     def write_byte_data_b(self, i2cAddress=32, reg=0, regValue=0):
+        self.settle.wait("i2c")
         self.rp_s.tx_txt("I2C:IO:W:B1 " + str(regValue))
         return
 
     def set_i2cAddress(self, i2cAddress):
-        self.rp_s.tx_txt('I2C:DEV%d "/dev/i2c-0"' % i2cAddress)
-        self.rp_s.tx_txt("I2C:FMODE ON")
+        with self.rp_s.batch():
+            self.rp_s.tx_txt('I2C:DEV%d "/dev/i2c-0"' % i2cAddress)
+            self.rp_s.tx_txt("I2C:FMODE ON")
         return
 
     def spi_init(self):
-        self.rp_s.tx_txt("SPI:INIT")
-        self.rp_s.tx_txt('SPI:INIT:DEV "/dev/spidev1.0"')
-        self.rp_s.tx_txt("SPI:SET:DEF")
-        self.rp_s.tx_txt("SPI:SET:MODE HISL")  # HISL LIST
-        self.rp_s.tx_txt("SPI:SET:CSMODE NORMAL")
-        self.rp_s.tx_txt("SPI:SET:SPEED 250000")
-        self.rp_s.tx_txt("SPI:SET:WORD 8")
-        self.rp_s.tx_txt("SPI:SET:SET")
-        self.rp_s.tx_txt("SPI:MSG:CREATE 1")
+        with self.rp_s.batch():
+            self.rp_s.tx_txt("SPI:INIT")
+            self.rp_s.tx_txt('SPI:INIT:DEV "/dev/spidev1.0"')
+            self.rp_s.tx_txt("SPI:SET:DEF")
+            self.rp_s.tx_txt("SPI:SET:MODE HISL")  # HISL LIST
+            self.rp_s.tx_txt("SPI:SET:CSMODE NORMAL")
+            self.rp_s.tx_txt("SPI:SET:SPEED 250000")
+            self.rp_s.tx_txt("SPI:SET:WORD 8")
+            self.rp_s.tx_txt("SPI:SET:SET")
+            self.rp_s.tx_txt("SPI:MSG:CREATE 1")
         return
 
     def spi_csmode(self, mode):
         print("SPI:SET:CSMODE " + mode)
-        self.rp_s.tx_txt("SPI:SET:CSMODE " + mode)
-        self.rp_s.tx_txt("SPI:SET:SET")
+        with self.rp_s.batch():
+            self.rp_s.tx_txt("SPI:SET:CSMODE " + mode)
+            self.rp_s.tx_txt("SPI:SET:SET")
         return
 
     def spi_mode(self, mode):
@@ -322,51 +401,73 @@ class RedCtl:
         - HISL = High idle level, Sample on leading edge
         - HIST = High idle level, Sample on trailing edge
         """
-        self.rp_s.tx_txt("SPI:SET:MODE " + mode)
-        self.rp_s.tx_txt("SPI:SET:SET")
+        with self.rp_s.batch():
+            self.rp_s.tx_txt("SPI:SET:MODE " + mode)
+            self.rp_s.tx_txt("SPI:SET:SET")
         return
 
     def send_spi_msc(self, msg):
-        # self.rp_s.tx_txt("SPI:MSG:CREATE 1")
-        self.rp_s.tx_txt("SPI:MSG0:TX3 " + msg)
-        self.rp_s.tx_txt("SPI:PASS")
-        # self.rp_s.tx_txt("SPI:MSG:DEL")
+        with self.rp_s.batch():
+            # self.rp_s.tx_txt("SPI:MSG:CREATE 1")
+            self.rp_s.tx_txt("SPI:MSG0:TX3 " + msg)
+            self.rp_s.tx_txt("SPI:PASS")
+            # self.rp_s.tx_txt("SPI:MSG:DEL")
         return
 
     def send_spi_msc1(self, msg):
-        # self.rp_s.tx_txt("SPI:MSG:CREATE 1")
-        self.rp_s.tx_txt("SPI:MSG0:TX1 " + msg)
-        self.rp_s.tx_txt("SPI:PASS")
-        # self.rp_s.tx_txt("SPI:MSG:DEL")
+        with self.rp_s.batch():
+            # self.rp_s.tx_txt("SPI:MSG:CREATE 1")
+            self.rp_s.tx_txt("SPI:MSG0:TX1 " + msg)
+            self.rp_s.tx_txt("SPI:PASS")
+            # self.rp_s.tx_txt("SPI:MSG:DEL")
         return
 
     def read_spi_msc(self):
-        self.rp_s.tx_txt("SPI:MSG0:RX3")
-        self.rp_s.tx_txt("SPI:PASS")
-        self.rp_s.tx_txt("SPI:MSG0:RX?")
-        data = self.rp_s.rx_txt()
+        with self.rp_s.batch() as b:
+            b.tx_txt("SPI:MSG0:RX3")
+            b.tx_txt("SPI:PASS")
+            b.query("SPI:MSG0:RX?")
+            b.flush()
+        data = b.responses[0]
         return data
 
     def spi_release(self):
-        self.rp_s.tx_txt("SPI:MSG:DEL")
-        self.rp_s.tx_txt("SPI:RELEASE")
+        with self.rp_s.batch():
+            self.rp_s.tx_txt("SPI:MSG:DEL")
+            self.rp_s.tx_txt("SPI:RELEASE")
         return
 
     def select_spi(self, ch="ES_DAC"):
-        if ch == "ES_DAC":
-            self.es_ss("ES")
-            self.dac_adc("DAC")
-            self.adc1_2("1")
-        elif ch == "SS_DAC":
-            self.es_ss("SS")
-            self.dac_adc("DAC")
-            self.adc1_2("1")
-        elif ch == "SS_ADC1":
-            self.es_ss("SS")
-            self.dac_adc("ADC")
-            self.adc1_2("1")
-        elif ch == "SS_ADC2":
-            self.es_ss("SS")
-            self.dac_adc("ADC")
-            self.adc1_2("2")
+        with self.rp_s.batch():
+            if ch == "ES_DAC":
+                self.es_ss("ES")
+                self.dac_adc("DAC")
+                self.adc1_2("1")
+            elif ch == "SS_DAC":
+                self.es_ss("SS")
+                self.dac_adc("DAC")
+                self.adc1_2("1")
+            elif ch == "SS_ADC1":
+                self.es_ss("SS")
+                self.dac_adc("ADC")
+                self.adc1_2("1")
+            elif ch == "SS_ADC2":
+                self.es_ss("SS")
+                self.dac_adc("ADC")
+                self.adc1_2("2")
         return
+
+    def invalidate(self, prefix=""):
+        """Forget the mirrored settings, e.g. after the board was touched by another client."""
+        if self.rp_s.shadow is not None:
+            self.rp_s.shadow.invalidate(prefix)
+
+    def shadow_report(self):
+        if self.rp_s.shadow is None:
+            return "SCPI shadow: off"
+        return self.rp_s.shadow.report()
+
+    def instrument(self, enable=True):
+        """Record latency and byte count of every SCPI transfer, returns the ScpiStats."""
+        self.rp_s.stats = ScpiStats() if enable else None
+        return self.rp_s.stats
@@ -0,0 +1,222 @@
+"""asyncio SCPI access to Red Pitaya.
+
+ascpi is the awaitable counterpart of redpitaya_scpi.scpi, several boards can
+be driven from one event loop:
+
+    async with ascpi("192.168.0.15") as rp:
+        await rp.tx_txt("ACQ:START")
+        data = await rp.acq_data(1, binary=True, convert=True, timeout=1.0)
+
+scpi_sync is a blocking scpi on top of an ascpi connection, it runs the
+coroutines on a shared background loop so RedCtl can use it unchanged.
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+import numpy as np
+import redpitaya_scpi as rp_scpi
+
+
+class ascpi (object):
+    """asyncio SCPI client used to access Red Pitaya over an IP network.
+
+    timeout is the default per-call timeout in seconds, every coroutine also
+    takes its own timeout argument (None keeps the default).
+    """
+    delimiter = '\r\n'
+
+    def __init__(self, host, timeout=None, port=5000, limit=1 << 22):
+        self.host    = host
+        self.port    = port
+        self.timeout = timeout
+        self.limit   = limit
+        self._delim  = self.delimiter.encode('utf-8')
+        self._reader = None
+        self._writer = None
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def _wait(self, coro, timeout):
+        if timeout is None:
+            timeout = self.timeout
+        return asyncio.wait_for(coro, timeout)
+
+    async def connect(self, timeout=None):
+        """Open IP connection."""
+        self._reader, self._writer = await self._wait(
+            asyncio.open_connection(self.host, self.port, limit=self.limit), timeout)
+        return self
+
+    async def close(self):
+        """Close IP connection."""
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except OSError:
+                pass
+        self._reader = None
+        self._writer = None
+
+    async def _send(self, data, timeout=None):
+        self._writer.write(data)
+        await self._wait(self._writer.drain(), timeout)
+
+    async def tx_txt(self, msg, timeout=None):
+        """Send text string ending and append delimiter."""
+        await self._send((msg + self.delimiter).encode('utf-8'), timeout)
+
+    async def tx_many(self, msgs, timeout=None):
+        """Send several commands with one write."""
+        if msgs:
+            await self._send((self.delimiter.join(msgs) + self.delimiter).encode('utf-8'), timeout)
+
+    async def rx_txt(self, timeout=None):
+        """Receive text string and return it after removing the delimiter."""
+        msg = await self._wait(self._reader.readuntil(self._delim), timeout)
+        return msg[:-len(self._delim)].decode('utf-8')
+
+    async def _rx_arb(self):
+        if await self._reader.readexactly(1) != b'#':
+            return False
+        numOfNumBytes = int(await self._reader.readexactly(1))
+        if numOfNumBytes <= 0:
+            return False
+        numOfBytes = int(await self._reader.readexactly(numOfNumBytes))
+        data = await self._reader.readexactly(numOfBytes + len(self._delim))
+        return memoryview(data)[:numOfBytes]
+
+    async def rx_arb(self, timeout=None):
+        """Recieve binary data (IEEE 488.2 definite length block) from scpi server."""
+        return await self._wait(self._rx_arb(), timeout)
+
+    async def txrx_txt(self, msg, timeout=None):
+        """Send/receive text string."""
+        await self.tx_txt(msg, timeout)
+        return await self.rx_txt(timeout)
+
+    async def acq_data(
+        self,
+        chan: int,
+        start: int = None,
+        end: int = None,
+        num_samples: int = None,
+        old: bool = False,
+        lat: bool = False,
+        binary: bool = False,
+        convert: bool = False,
+        input4: bool = False,
+        timeout: float = None
+    ):
+        """Returns the acquired data on a channel, see scpi.acq_data."""
+        query = rp_scpi.acq_query(chan, start, end, num_samples, old, lat, input4)
+        await self.tx_many(['ACQ:DATA:UNITS?', query], timeout)
+        units = await self.rx_txt(timeout)
+        if binary:
+            reply = await self.rx_arb(timeout)
+        else:
+            reply = await self.rx_txt(timeout)
+        return rp_scpi.acq_decode(reply, units, binary, convert)
+
+    async def acq_data_multi(
+        self,
+        chans: tuple = (1, 2),
+        start: int = None,
+        end: int = None,
+        num_samples: int = None,
+        old: bool = False,
+        lat: bool = False,
+        out=None,
+        input4: bool = False,
+        timeout: float = None
+    ):
+        """Returns several channels of the same trigger event as one array, see scpi.acq_data_multi."""
+        queries = [rp_scpi.acq_query(chan, start, end, num_samples, old, lat, input4) for chan in chans]
+        await self.tx_many(['ACQ:DATA:UNITS?'] + queries, timeout)
+        units = await self.rx_txt(timeout)
+        rows = []
+        for i in range(len(chans)):
+            reply = await self.rx_arb(timeout)
+            if out is None:
+                rows.append(rp_scpi.acq_decode(reply, units, True, True))
+            else:
+                rp_scpi.acq_decode_into(reply, units, out[i])
+        if out is None:
+            return np.stack(rows)
+        return out
+
+    async def sour_set(self, chan: int, *args, timeout: float = None, **kwargs) -> None:
+        """Set the parameters for signal generator on one channel, see scpi.sour_set."""
+        await self.tx_many(rp_scpi.sour_commands(chan, *args, **kwargs), timeout)
+
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def background_loop():
+    """Return the shared event loop that scpi_sync runs its connections on."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="scpi-loop", daemon=True).start()
+    return _loop
+
+
+class scpi_sync (rp_scpi.scpi):
+    """Blocking scpi running over an ascpi connection.
+
+    Only the transport is replaced, batching, parsing and the SCPI command
+    functions are inherited from scpi. All connections share one event loop.
+    """
+
+    def __init__(self, host, timeout=None, port=5000, rx_bufsize=1 << 17, loop=None):
+        self._loop = loop or background_loop()
+        self._aio = ascpi(host, port=port)
+        super().__init__(host, timeout=timeout, port=port, rx_bufsize=rx_bufsize)
+
+    def _run(self, coro):
+        fut = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        try:
+            return fut.result(self.timeout)
+        except concurrent.futures.TimeoutError:
+            fut.cancel()
+            raise
+
+    def _connect(self):
+        try:
+            self._run(self._aio.connect())
+        except (OSError, asyncio.TimeoutError) as e:
+            print('SCPI >> connect({!s:s}:{:d}) failed: {!s:s}'.format(self.host, self.port, e))
+
+    def _send(self, data):
+        return self._run(self._aio._send(data))
+
+    def _recv_into(self, view):
+        data = self._run(self._aio._reader.read(len(view)))
+        view[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        """Close IP connection, waits for the loop to close the stream."""
+        if getattr(self, '_aio', None) is not None and self._aio._writer is not None:
+            if self._loop.is_running():
+                self._run(self._aio.close())
+        self._socket = None
+
+    def __del__(self):
+        # never block in a finalizer, it may run on the loop thread or at shutdown
+        aio = getattr(self, '_aio', None)
+        if aio is not None and aio._writer is not None and not self._loop.is_closed():
+            try:
+                self._loop.call_soon_threadsafe(aio._writer.close)
+            except RuntimeError:
+                pass
+        self._socket = None
@@ -1,17 +1,20 @@
 """SCPI access to Red Pitaya."""
 
 import socket
-import struct
+import time
 import numpy as np
 
 __author__ = "Luka Golinar, Iztok Jeras, Miha Gjura"
 __copyright__ = "Copyright 2023, Red Pitaya"
 
+# Sample format of binary data blocks per ACQ:DATA:UNITS
+ACQ_WIRE_DTYPE = {"VOLTS": ">f4", "RAW": ">i2"}
+
 class scpi (object):
     """SCPI class used to access Red Pitaya over an IP network."""
     delimiter = '\r\n'
 
-    def __init__(self, host, timeout=None, port=5000):
+    def __init__(self, host, timeout=None, port=5000, rx_bufsize=1 << 17):
         """Initialize object and open IP connection.
         Host IP should be a string in parentheses, like '192.168.1.100'.
         """
@@ -19,16 +22,40 @@ class scpi (object):
         self.port    = port
         self.timeout = timeout
 
+        # Reusable receive buffer, [_rx_start:_rx_end] holds received but unparsed bytes
+        self._rx_buf   = bytearray(rx_bufsize)
+        self._rx_view  = memoryview(self._rx_buf)
+        self._rx_start = 0
+        self._rx_end   = 0
+        self._delim    = self.delimiter.encode('utf-8')
+
+        # Commands and reply readers queued by an open batch, None when not batching
+        self._tx_queue = None
+        self._rx_queue = None
+
+        # Optional shadow.ShadowState, drops writes and queries that change nothing
+        self.shadow = None
+
+        # Optional scpi_stats.ScpiStats, records every transfer when set
+        self.stats = None
+
+        self._socket = None
+        self._connect()
+
+    def _connect(self):
+        """Open the transport."""
         try:
             self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 
-            if timeout is not None:
-                self._socket.settimeout(timeout)
+            if self.timeout is not None:
+                self._socket.settimeout(self.timeout)
 
-            self._socket.connect((host, port))
+            self._socket.connect((self.host, self.port))
+            # Replies are waited for anyway, do not let Nagle hold back short commands
+            self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
 
         except socket.error as e:
-            print('SCPI >> connect({!s:s}:{:d}) failed: {!s:s}'.format(host, port, e))
+            print('SCPI >> connect({!s:s}:{:d}) failed: {!s:s}'.format(self.host, self.port, e))
 
     def __del__(self):
         if self._socket is not None:
@@ -39,51 +66,176 @@ class scpi (object):
         """Close IP connection."""
         self.__del__()
 
+    def _send(self, data):
+        """Transport primitive, write all of data."""
+        return self._socket.sendall(data)
+
+    def _recv_into(self, view):
+        """Transport primitive, receive into view and return the byte count."""
+        return self._socket.recv_into(view)
+
+    def _rx_recv(self, space):
+        """Receive into the free tail of the buffer, keeping at least `space` bytes free."""
+        if len(self._rx_buf) - self._rx_end < space:
+            pending = self._rx_end - self._rx_start
+            if pending + space > len(self._rx_buf):
+                # Grow, views handed out before stay valid on the old buffer
+                buf = bytearray(max(pending + space, 2 * len(self._rx_buf)))
+                buf[:pending] = self._rx_view[self._rx_start:self._rx_end]
+                self._rx_buf  = buf
+                self._rx_view = memoryview(buf)
+            else:
+                # Compact, unparsed bytes move to the front of the buffer
+                self._rx_buf[:pending] = bytes(self._rx_view[self._rx_start:self._rx_end])
+            self._rx_start = 0
+            self._rx_end   = pending
+
+        n = self._recv_into(self._rx_view[self._rx_end:])
+        if n == 0:
+            raise ConnectionError('SCPI >> connection closed by {!s:s}'.format(self.host))
+        self._rx_end += n
+        return n
+
+    def _rx_need(self, size):
+        """Block until at least `size` unparsed bytes are in the receive buffer."""
+        while self._rx_end - self._rx_start < size:
+            self._rx_recv(size - (self._rx_end - self._rx_start))
+
     def rx_txt(self, chunksize = 4096):
         """Receive text string and return it after removing the delimiter."""
-        msg = ''
+        if self._tx_queue:
+            self._flush()
+        if self.stats is not None:
+            t0 = time.perf_counter()
+            msg = self._rx_txt(chunksize)
+            self.stats.rx('rx_txt', len(msg) + len(self._delim), time.perf_counter() - t0)
+            return msg
+        return self._rx_txt(chunksize)
+
+    def _rx_txt(self, chunksize):
+        # Single byte find runs as memchr, a multi byte pattern is far slower,
+        # so look for the last delimiter byte and check the bytes before it
+        last = self._delim[-1]
+        head = len(self._delim) - 1
+        scan = self._rx_start
         while 1:
-            chunk = self._socket.recv(chunksize).decode('utf-8') # Receive chunk size of 2^n preferably
-            msg += chunk
-            if (len(msg) > 2 and msg[-2:] == self.delimiter):
-                return msg[:-2]
-
+            pos = self._rx_buf.find(last, scan, self._rx_end)
+            if pos < 0:
+                # Only the new bytes are scanned, the buffer may move on receive
+                pending = self._rx_end - self._rx_start
+                self._rx_recv(chunksize)
+                scan = self._rx_start + pending
+                continue
+            end = pos - head
+            if end >= self._rx_start and self._rx_buf[end:pos + 1] == self._delim:
+                msg = str(self._rx_view[self._rx_start:end], 'utf-8')
+                self._rx_start = pos + 1
+                return msg
+            scan = pos + 1
 
     def rx_arb(self):
-        """ Recieve binary data from scpi server"""
-        numOfBytes = 0
-        data=b''
-        while len(data) != 1:
-            data = self._socket.recv(1)
-        if data != b'#':
+        """ Recieve binary data from scpi server
+
+        Parses the IEEE 488.2 definite length block header (#<n><length>) and
+        returns a memoryview of the payload inside the receive buffer. The view
+        is only valid until the next receive call, copy it if it must be kept.
+        """
+        if self._tx_queue:
+            self._flush()
+        if self.stats is not None:
+            t0 = time.perf_counter()
+            data = self._rx_arb()
+            size = len(data) + 2 + len(str(len(data))) + len(self._delim) if data else 0
+            self.stats.rx('rx_arb', size, time.perf_counter() - t0)
+            return data
+        return self._rx_arb()
+
+    def _rx_arb(self):
+        self._rx_need(2)
+        start = self._rx_start
+        if self._rx_buf[start] != ord('#'):
+            self._rx_start += 1
             return False
-        data=b''
 
-        while len(data) != 1:
-            data = self._socket.recv(1)
-        numOfNumBytes = int(data)
-        if numOfNumBytes <= 0:
+        numOfNumBytes = self._rx_buf[start + 1] - ord('0')
+        if not 0 < numOfNumBytes <= 9:
+            self._rx_start += 2
             return False
-        data=b''
 
-        while len(data) != numOfNumBytes:
-            data += (self._socket.recv(1))
-        numOfBytes = int(data)
-        data=b''
+        self._rx_need(2 + numOfNumBytes)
+        start = self._rx_start
+        numOfBytes = int(self._rx_buf[start + 2:start + 2 + numOfNumBytes])
 
-        while len(data) < numOfBytes:
-            r_size = min(numOfBytes - len(data),4096)
-            data += (self._socket.recv(r_size))
+        # Payload and the terminating delimiter arrive with as few recv_into calls as possible
+        head = 2 + numOfNumBytes
+        self._rx_need(head + numOfBytes + len(self._delim))
+        start = self._rx_start
+        data = self._rx_view[start + head:start + head + numOfBytes]
+        self._rx_start = start + head + numOfBytes + len(self._delim)
         return data
 
     def tx_txt(self, msg):
-        """Send text string ending and append delimiter."""
-        return self._socket.sendall((msg + self.delimiter).encode('utf-8')) # was send(().encode('utf-8'))
+        """Send text string ending and append delimiter.
+        Inside a batch the command is queued and sent when the batch is flushed.
+        """
+        if self.shadow is not None and not self.shadow.filter(msg):
+            return None
+        if self._tx_queue is not None:
+            self._tx_queue.append(msg)
+            if self.stats is not None:
+                self.stats.tx(msg, len(msg) + len(self._delim), 0.0)
+            return None
+        if self.stats is not None:
+            data = (msg + self.delimiter).encode('utf-8')
+            t0 = time.perf_counter()
+            self._send(data)
+            self.stats.tx(msg, len(data), time.perf_counter() - t0)
+            return None
+        return self._send((msg + self.delimiter).encode('utf-8')) # was send(().encode('utf-8'))
+
+    def batch(self):
+        """Return a context manager that pipelines commands and queries.
+
+        Every tx_txt issued inside the block is queued and the whole queue is
+        sent with a single sendall when the block exits (or on flush()).
+        Replies to queued queries are read back in order afterwards:
+
+            with rp_s.batch() as b:
+                b.tx_txt("ACQ:DEC 8")
+                b.query("ACQ:TRIG:STAT?")
+                b.query("ACQ:TRIG:FILL?")
+            stat, fill = b.responses
+
+        A batch opened inside another one joins the outer queue and sends
+        nothing on exit, code that reads responses calls b.flush() at the end
+        of its block so it also works inside a caller's batch.
+        """
+        return scpi_batch(self)
+
+    def _flush(self):
+        """Send the queued commands in one write and read the queued replies."""
+        tx_queue, rx_queue = self._tx_queue, self._rx_queue
+        self._tx_queue, self._rx_queue = [], []
+        if tx_queue:
+            data = (self.delimiter.join(tx_queue) + self.delimiter).encode('utf-8')
+            t0 = time.perf_counter()
+            self._send(data)
+            if self.stats is not None:
+                self.stats.flush(len(tx_queue), len(data), time.perf_counter() - t0)
+        for batch, idx, reader in rx_queue:
+            batch.responses[idx] = reader()
 
     def txrx_txt(self, msg):
         """Send/receive text string."""
+        if self.shadow is not None:
+            reply = self.shadow.answer(msg)
+            if reply is not None:
+                return reply
         self.tx_txt(msg)
-        return self.rx_txt()
+        reply = self.rx_txt()
+        if self.shadow is not None:
+            self.shadow.learn(msg, reply)
+        return reply
 
     def check_error(self):
         res = int(self.stb_q())
@@ -180,138 +332,15 @@ class scpi (object):
         
         """
 
-        ### Constants ###
-        waveform_list = ["SINE","SQUARE","TRIANGLE","SAWU","SAWD","PWM","ARBITRARY","DC","DC_NEG"]
-        trigger_list = ["EXT_PE","EXT_NE","INT","GATED"]
-        buff_size = 16384
-
-        ### Limits ###
-        volt_lim = 1
-        offs_lim = 1
-        phase_lim = 360
-        freq_up_lim = 50e6          # 50 MHz
-        freq_down_lim = 0
-
-        if siglab:
-            volt_lim = 5
-            offs_lim = 5
-        elif sdrlab:
-            freq_down_lim = 300e3   # 300 kHz
-
-
-
-        ### CHECK FOR ERRORS ###
-
-        try:
-            assert chan in (1,2)
-        except AssertionError as channel_err:
-            raise ValueError("Channel needs to be either 1 or 2") from channel_err
-
-        try:
-            assert func.upper() in waveform_list
-        except AssertionError as waveform_err:
-            raise ValueError(f"{func.upper()} is not a defined waveform") from waveform_err
-
-        try:
-            assert freq_down_lim < freq <= freq_up_lim
-        except AssertionError as freq_err:
-            raise ValueError(f"Frequency is out of range {freq_down_lim, freq_up_lim} Hz") from freq_err
-
-        try:
-            assert abs(volt) <= volt_lim
-        except AssertionError as ampl_err:
-            raise ValueError(f"Amplitude is out of range {-volt_lim, volt_lim} V") from ampl_err
-
-        try:
-            assert abs(offset) <= offs_lim
-        except AssertionError as offs_err:
-            raise ValueError(f"Offset is out of range {-offs_lim, offs_lim} V") from offs_err
-
-        try:
-            assert 0 <= dcyc <= 1
-        except AssertionError as dcyc_err:
-            raise ValueError(f"Duty Cycle is out of range {0, 1}") from dcyc_err
-
-        try:
-            assert abs(phase) <= phase_lim
-        except AssertionError as phase_err:
-            raise ValueError(f"Phase is out of range {-phase_lim, phase_lim} deg") from phase_err
-
-        if data is not None:
-
-            try:
-                assert data.shape[0] <= buff_size
-            except AssertionError as data_err:
-                raise ValueError(f"Data array is too long. Max length is {buff_size}") from data_err
-
-            #try:
-            #    assert max(absolute(data)) <= volt_lim
-            #except AssertionError:
-            #    raise ValueError(f"Amplitude of data is out of range {-volt_lim, volt_lim}")
-
-        try:
-            assert ncyc >= 1
-        except AssertionError as ncyc_err:
-            raise ValueError("NCYC minimum is 1") from ncyc_err
-
-        try:
-            assert nor >= 1
-        except AssertionError as nor_err:
-            raise ValueError("NOR minimum is 1") from nor_err
-
-        if period is not None:
-            try:
-                assert period >= 1
-            except AssertionError as period_err:
-                raise ValueError("Minimal burst period 1 µs") from period_err
-
-        try:
-            assert trig.upper() in trigger_list
-        except AssertionError as trig_err:
-            raise ValueError(f"{trig.upper()} is not a defined trigger source") from trig_err
-
-        try:
-            assert not((siglab is True) and (sdrlab is True))
-        except AssertionError as board_err:
-            raise ValueError("Please select only one board option. 'siglab' and 'sdrlab' cannot be true at the same time.") from board_err
-
-
-
-        ### Variables ###
-        wf_data = []
-
-
-        ### SEND COMMANDS TO RP ###
-        self.tx_txt(f"SOUR{chan}:FUNC {func.upper()}")
-        self.tx_txt(f"SOUR{chan}:VOLT {volt}")
-
-        if func.upper() not in waveform_list[7:9]:
-            self.tx_txt(f"SOUR{chan}:FREQ:FIX {freq}")
-
-        self.tx_txt(f"SOUR{chan}:VOLT:OFFS {offset}")
-        self.tx_txt(f"SOUR{chan}:PHAS {phase}")
-
-        if func.upper() == "PWM":
-            self.tx_txt(f"SOUR{chan}:DCYC {dcyc}")
-
-        if (data is not None) and (func.upper() == "ARBITRARY"):
-            for n in data:
-                wf_data.append(f"{n:.5f}")
-            cust_wf = ", ".join(map(str, wf_data))
-
-            self.tx_txt(f"SOUR{chan}:TRAC:DATA:DATA {cust_wf}")
+        cmds = sour_commands(
+            chan, func, volt, freq, offset, phase, dcyc, data,
+            burst, ncyc, nor, period, trig, sdrlab, siglab
+        )
 
-        if burst:
-            self.tx_txt(f"SOUR{chan}:BURS:STAT BURST")
-            self.tx_txt(f"SOUR{chan}:BURS:NCYC {ncyc}")
-            self.tx_txt(f"SOUR{chan}:BURS:NOR {nor}")
-
-            if period is not None:
-                self.tx_txt(f"SOUR{chan}:BURS:INT:PER {period}")
-        else:
-            self.tx_txt(f"SOUR{chan}:BURS:STAT CONTINUOUS")
-
-        self.tx_txt(f"SOUR{chan}:TRIG:SOUR {trig.upper()}")
+        # Queue the whole configuration and send it as one write
+        with self.batch():
+            for cmd in cmds:
+                self.tx_txt(cmd)
 
         #print(f"SOUR{chan} set successfully")
 
@@ -472,34 +501,35 @@ class scpi (object):
 
 
         ### SEND COMMANDS TO RP ###
-        self.tx_txt(f"ACQ:DEC {dec}")
+        with self.batch():
+            self.tx_txt(f"ACQ:DEC {dec}")
 
-        if averaging:
-            self.tx_txt("ACQ:AVG ON")
-        else:
-            self.tx_txt("ACQ:AVG OFF")
+            if averaging:
+                self.tx_txt("ACQ:AVG ON")
+            else:
+                self.tx_txt("ACQ:AVG OFF")
 
-        if trig_delay_ns:
-            self.tx_txt(f"ACQ:TRIG:DLY:NS {trig_delay}")
-        else:
-            self.tx_txt(f"ACQ:TRIG:DLY {trig_delay}")
+            if trig_delay_ns:
+                self.tx_txt(f"ACQ:TRIG:DLY:NS {trig_delay}")
+            else:
+                self.tx_txt(f"ACQ:TRIG:DLY {trig_delay}")
 
-        if units is not None:
-            self.tx_txt(f"ACQ:DATA:UNITS {units.upper()}")
-        if sample_format is not None:
-            self.tx_txt(f"ACQ:DATA:FORMAT {sample_format.upper()}")
+            if units is not None:
+                self.tx_txt(f"ACQ:DATA:UNITS {units.upper()}")
+            if sample_format is not None:
+                self.tx_txt(f"ACQ:DATA:FORMAT {sample_format.upper()}")
 
-        if gain is not None:
-            for i in range(n):
-                self.tx_txt(f"ACQ:SOUR{i+1}:GAIN {gain[i].upper()}")
+            if gain is not None:
+                for i in range(n):
+                    self.tx_txt(f"ACQ:SOUR{i+1}:GAIN {gain[i].upper()}")
 
-        self.tx_txt(f"ACQ:TRIG:LEV {trig_lvl}")
+            self.tx_txt(f"ACQ:TRIG:LEV {trig_lvl}")
 
-        if siglab and coupling is not None:
-            for i in range(n):
-                self.tx_txt(f"ACQ:SOUR{i+1}:COUP {coupling[i].upper()}")
+            if siglab and coupling is not None:
+                for i in range(n):
+                    self.tx_txt(f"ACQ:SOUR{i+1}:COUP {coupling[i].upper()}")
 
-            self.tx_txt(f"ACQ:TRIG:EXT:LEV {ext_trig_lvl}")
+                self.tx_txt(f"ACQ:TRIG:EXT:LEV {ext_trig_lvl}")
 
         #print("ACQ set successfully")
 
@@ -544,28 +574,31 @@ class scpi (object):
             raise ValueError("Please select only one board option. 'siglab' and 'input4' cannot be true at the same time.") from board_err
 
 
-        settings = []
-
         if input4:   # Set number of channels
             n = 4
         else:
             n = 2
 
-        settings.append(self.txrx_txt("ACQ:DEC?"))
-        settings.append(self.txrx_txt("ACQ:AVG?"))
-        settings.append(self.txrx_txt("ACQ:TRIG:DLY?"))
-        settings.append(self.txrx_txt("ACQ:TRIG:DLY:NS?"))
-        settings.append(self.txrx_txt("ACQ:TRIG:LEV?"))
-        settings.append(self.txrx_txt("ACQ:BUF:SIZE?"))
+        # All queries go out in one write, the answers come back in the same order
+        with self.batch() as b:
+            b.query("ACQ:DEC?")
+            b.query("ACQ:AVG?")
+            b.query("ACQ:TRIG:DLY?")
+            b.query("ACQ:TRIG:DLY:NS?")
+            b.query("ACQ:TRIG:LEV?")
+            b.query("ACQ:BUF:SIZE?")
 
-        for i in range(n):
-            settings.append(self.txrx_txt(f"ACQ:SOUR{i+1}:GAIN?"))
+            for i in range(n):
+                b.query(f"ACQ:SOUR{i+1}:GAIN?")
 
-        if siglab:
-            for i in range(2):
-                settings.append(self.txrx_txt(f"ACQ:SOUR{i+1}:COUP?"))
+            if siglab:
+                for i in range(2):
+                    b.query(f"ACQ:SOUR{i+1}:COUP?")
 
-            settings.append(self.txrx_txt("ACQ:TRIG:EXT:LEV?"))
+                b.query("ACQ:TRIG:EXT:LEV?")
+            b.flush()
+
+        settings = b.responses
 
 
         print(f"Decimation: {settings[0]}")
@@ -629,6 +662,8 @@ class scpi (object):
             convert (bool, optional):
                 Set to True to convert data to a list of floats (VOLTS) or integers (RAW).
                 Otherwise returns a list of str (VOLTS) or int (RAW).
+                With binary = True the data is returned as a numpy array decoded
+                from the received block in one pass (float32 for VOLTS, int16 for RAW).
                 Defaults to False.
             input4 (bool, optional) :
                 Set to True if operating with STEMlab 125-14 4-Input.
@@ -642,86 +677,70 @@ class scpi (object):
         
         """
 
-        low_lim = 0
-        up_lim = 16384
-
-        # Check input data for errors
-        if input4:
-            try:
-                assert chan in (1,2,3,4)
-            except AssertionError as chanel_err:
-                raise ValueError("Channel needs to be either 1, 2, 3 or 4") from chanel_err
-        else:
-            try:
-                assert chan in (1,2)
-            except AssertionError as chanel_err:
-                raise ValueError("Channel needs to be either 1 or 2") from chanel_err
-
-        try:
-            assert not((old is True) and (lat is True))
-        except AssertionError as arg_err:
-            raise ValueError("Please select only one. 'old' and 'lat' cannot be True at the same time.") from arg_err
-
-        if start is not None:
-            try:
-                assert 16384 >= start >= 0
-            except AssertionError as start_err:
-                raise ValueError(f"Start position out of range {low_lim, up_lim}") from start_err
-
-        if end is not None:
-            try:
-                assert 16384 >= end >= 0
-            except AssertionError as end_err:
-                raise ValueError(f"End position out of range {low_lim, up_lim}") from end_err
-
-        if num_samples is not None:
-            try:
-                assert 16384 >= num_samples >= 0
-            except AssertionError as sample_err:
-                raise ValueError(f"Sample number out of range {low_lim, up_lim}") from sample_err
+        query = acq_query(chan, start, end, num_samples, old, lat, input4)
 
         # Get data type from Red Pitaya
         units = self.txrx_txt('ACQ:DATA:UNITS?')
         # format = self.txrx_txt("ACQ:DATA:FORMAT?")
 
+        self.tx_txt(query)
 
-        # Determine the output data
-        if(start is not None) and (end is not None):
-            self.tx_txt(f"ACQ:SOUR{chan}:DATA:STA:END? {start},{end}")
-
-        elif(start is not None) and (num_samples is not None):
-            self.tx_txt(f"ACQ:SOUR{chan}:DATA:STA:N? {start},{num_samples}")
+        if binary:
+            return acq_decode(self.rx_arb(), units, binary, convert)
+        return acq_decode(self.rx_txt(), units, binary, convert)
 
-        elif old and (num_samples is not None):
-            self.tx_txt(f"ACQ:SOUR{chan}:DATA:OLD:N? {num_samples}")
+    def acq_data_multi(
+        self,
+        chans: tuple = (1, 2),
+        start: int = None,
+        end: int = None,
+        num_samples: int = None,
+        old: bool = False,
+        lat: bool = False,
+        out: np.ndarray = None,
+        input4: bool = False
+    ) -> np.ndarray:
+        """
+        Returns the acquired data of several channels of the same trigger event as one array.
 
-        elif lat and (num_samples is not None):
-            self.tx_txt(f"ACQ:SOUR{chan}:DATA:LAT:N? {num_samples}")
+        Requires ACQ:DATA:FORMAT BIN. The data queries of all channels are sent in one
+        write and every binary block is decoded straight into its row of the result.
 
-        else:
-            self.tx_txt(f"ACQ:SOUR{chan}:DATA?")
+        Parameters
+        ----------
+            chans (tuple) :
+                Input channels, one row each.
+            start, end, num_samples, old, lat, input4 :
+                Select the samples, see acq_data.
+            out (np.ndarray, optional):
+                Preallocated (len(chans), N) array the data is written into,
+                float32 for VOLTS, int16 for RAW. Allocated when None.
+
+        Returns a (len(chans), N) array, out if it was given. Inside a
+        caller's batch, out is filled when that batch is flushed.
+        """
 
-        # Convert data
-        if binary:
-            buff_byte = self.rx_arb()
+        units = self.txrx_txt('ACQ:DATA:UNITS?')
+        rows = [] if out is None else out
 
-            if convert:
-                if units == "VOLTS":
-                    buff = [struct.unpack('!f',bytearray(buff_byte[i:i+4]))[0] for i in range(0, len(buff_byte), 4)]
-                elif units == "RAW":
-                    buff = [struct.unpack('!h',bytearray(buff_byte[i:i+2]))[0] for i in range(0, len(buff_byte), 2)]
-            else:
-                buff = buff_byte
-        else:
-            buff_string = self.rx_txt()
+        def reader(i):
+            def read():
+                if out is None:
+                    rows.append(acq_decode(self.rx_arb(), units, True, True))
+                else:
+                    acq_decode_into(self.rx_arb(), units, out[i])
+            return read
 
-            if convert:
-                buff_string = buff_string.strip('{}\n\r').replace("  ", "").split(',')
-                buff = list(map(float, buff_string))
-            else:
-                buff = buff_string
+        with self.batch() as b:
+            for i, chan in enumerate(chans):
+                b.query(acq_query(chan, start, end, num_samples, old, lat, input4), reader(i))
+            # with out, a caller's batch may fill it on its own flush
+            if out is None:
+                b.flush()
 
-        return buff
+        if out is None:
+            return np.stack(rows)
+        return out
 
 
     def uart_set(
@@ -777,14 +796,15 @@ class scpi (object):
 
         # Configuring UART
 
-        self.tx_txt("UART:INIT")
-        self.tx_txt(f"UART:SPEED {speed}")
-        self.tx_txt(f"UART:BITS {bits.upper()}")
-        self.tx_txt(f"UART:STOPB STOP{stop}")
-        self.tx_txt(f"UART:PARITY {parity.upper()}")
-        self.tx_txt(f"UART:TIMEOUT {timeout}")
+        with self.batch():
+            self.tx_txt("UART:INIT")
+            self.tx_txt(f"UART:SPEED {speed}")
+            self.tx_txt(f"UART:BITS {bits.upper()}")
+            self.tx_txt(f"UART:STOPB STOP{stop}")
+            self.tx_txt(f"UART:PARITY {parity.upper()}")
+            self.tx_txt(f"UART:TIMEOUT {timeout}")
 
-        self.tx_txt("UART:SETUP")
+            self.tx_txt("UART:SETUP")
         print("UART is configured")
 
     def uart_get_settings(
@@ -934,12 +954,13 @@ class scpi (object):
 
         # Configuring SPI
 
-        self.tx_txt(f"SPI:SET:MODE {spi_mode.upper()}")
-        self.tx_txt(f"SPI:SET:CSMODE {cs_mode.upper()}")
-        self.tx_txt(f"SPI:SET:SPEED {speed}")
-        self.tx_txt(f"SPI:SET:WORD {word_len}")
+        with self.batch():
+            self.tx_txt(f"SPI:SET:MODE {spi_mode.upper()}")
+            self.tx_txt(f"SPI:SET:CSMODE {cs_mode.upper()}")
+            self.tx_txt(f"SPI:SET:SPEED {speed}")
+            self.tx_txt(f"SPI:SET:WORD {word_len}")
 
-        self.tx_txt("SPI:SET:SET")
+            self.tx_txt("SPI:SET:SET")
         print("SPI is configured")
 
     def spi_get_settings(
@@ -954,14 +975,16 @@ class scpi (object):
 
         # Configuring SPI
 
-        self.tx_txt("SPI:SET:GET")
-        settings = []
+        with self.batch() as b:
+            b.tx_txt("SPI:SET:GET")
+            b.query("SPI:SET:MODE?")
+            b.query("SPI:SET:CSMODE?")
+            b.query("SPI:SET:SPEED?")
+            b.query("SPI:SET:WORD?")
+            b.query("SPI:MSG:SIZE?")
+            b.flush()
 
-        settings.append(self.txrx_txt("SPI:SET:MODE?"))
-        settings.append(self.txrx_txt("SPI:SET:CSMODE?"))
-        settings.append(self.txrx_txt("SPI:SET:SPEED?"))
-        settings.append(self.txrx_txt("SPI:SET:WORD?"))
-        settings.append(self.txrx_txt("SPI:MSG:SIZE?"))
+        settings = b.responses
 
         print(f"SPI mode: {settings[0]}")
         print(f"CS mode: {settings[1]}")
@@ -1026,4 +1049,322 @@ class scpi (object):
 
     def err_n(self):
         """Error next."""
-        return self.txrx_txt('SYST:ERR:NEXT?')
\ No newline at end of file
+        return self.txrx_txt('SYST:ERR:NEXT?')
+
+
+# Command helpers shared with the asyncio client
+
+def sour_commands(
+    chan: int,
+    func: str = "sine",
+    volt: float = 1,
+    freq: float = 1000,
+    offset: float = 0,
+    phase: float = 0,
+    dcyc: float = 0.5,
+    data: np.ndarray = None,
+    burst: bool = False,
+    ncyc: int = 1,
+    nor: int = 1,
+    period: int = None,
+    trig: str = "int",
+    sdrlab: bool = False,
+    siglab: bool = False,
+) -> list:
+    """
+    Check the generator settings and return the SCPI commands that apply them.
+    Parameters and raised errors are the same as for scpi.sour_set.
+    """
+
+    ### Constants ###
+    waveform_list = ["SINE","SQUARE","TRIANGLE","SAWU","SAWD","PWM","ARBITRARY","DC","DC_NEG"]
+    trigger_list = ["EXT_PE","EXT_NE","INT","GATED"]
+    buff_size = 16384
+
+    ### Limits ###
+    volt_lim = 1
+    offs_lim = 1
+    phase_lim = 360
+    freq_up_lim = 50e6          # 50 MHz
+    freq_down_lim = 0
+
+    if siglab:
+        volt_lim = 5
+        offs_lim = 5
+    elif sdrlab:
+        freq_down_lim = 300e3   # 300 kHz
+
+
+
+    ### CHECK FOR ERRORS ###
+
+    try:
+        assert chan in (1,2)
+    except AssertionError as channel_err:
+        raise ValueError("Channel needs to be either 1 or 2") from channel_err
+
+    try:
+        assert func.upper() in waveform_list
+    except AssertionError as waveform_err:
+        raise ValueError(f"{func.upper()} is not a defined waveform") from waveform_err
+
+    try:
+        assert freq_down_lim < freq <= freq_up_lim
+    except AssertionError as freq_err:
+        raise ValueError(f"Frequency is out of range {freq_down_lim, freq_up_lim} Hz") from freq_err
+
+    try:
+        assert abs(volt) <= volt_lim
+    except AssertionError as ampl_err:
+        raise ValueError(f"Amplitude is out of range {-volt_lim, volt_lim} V") from ampl_err
+
+    try:
+        assert abs(offset) <= offs_lim
+    except AssertionError as offs_err:
+        raise ValueError(f"Offset is out of range {-offs_lim, offs_lim} V") from offs_err
+
+    try:
+        assert 0 <= dcyc <= 1
+    except AssertionError as dcyc_err:
+        raise ValueError(f"Duty Cycle is out of range {0, 1}") from dcyc_err
+
+    try:
+        assert abs(phase) <= phase_lim
+    except AssertionError as phase_err:
+        raise ValueError(f"Phase is out of range {-phase_lim, phase_lim} deg") from phase_err
+
+    if data is not None:
+
+        try:
+            assert data.shape[0] <= buff_size
+        except AssertionError as data_err:
+            raise ValueError(f"Data array is too long. Max length is {buff_size}") from data_err
+
+        #try:
+        #    assert max(absolute(data)) <= volt_lim
+        #except AssertionError:
+        #    raise ValueError(f"Amplitude of data is out of range {-volt_lim, volt_lim}")
+
+    try:
+        assert ncyc >= 1
+    except AssertionError as ncyc_err:
+        raise ValueError("NCYC minimum is 1") from ncyc_err
+
+    try:
+        assert nor >= 1
+    except AssertionError as nor_err:
+        raise ValueError("NOR minimum is 1") from nor_err
+
+    if period is not None:
+        try:
+            assert period >= 1
+        except AssertionError as period_err:
+            raise ValueError("Minimal burst period 1 µs") from period_err
+
+    try:
+        assert trig.upper() in trigger_list
+    except AssertionError as trig_err:
+        raise ValueError(f"{trig.upper()} is not a defined trigger source") from trig_err
+
+    try:
+        assert not((siglab is True) and (sdrlab is True))
+    except AssertionError as board_err:
+        raise ValueError("Please select only one board option. 'siglab' and 'sdrlab' cannot be true at the same time.") from board_err
+
+
+
+    ### Variables ###
+    wf_data = []
+    cmds = []
+
+
+    ### BUILD COMMANDS ###
+    cmds.append(f"SOUR{chan}:FUNC {func.upper()}")
+    cmds.append(f"SOUR{chan}:VOLT {volt}")
+
+    if func.upper() not in waveform_list[7:9]:
+        cmds.append(f"SOUR{chan}:FREQ:FIX {freq}")
+
+    cmds.append(f"SOUR{chan}:VOLT:OFFS {offset}")
+    cmds.append(f"SOUR{chan}:PHAS {phase}")
+
+    if func.upper() == "PWM":
+        cmds.append(f"SOUR{chan}:DCYC {dcyc}")
+
+    if (data is not None) and (func.upper() == "ARBITRARY"):
+        for n in data:
+            wf_data.append(f"{n:.5f}")
+        cust_wf = ", ".join(map(str, wf_data))
+
+        cmds.append(f"SOUR{chan}:TRAC:DATA:DATA {cust_wf}")
+
+    if burst:
+        cmds.append(f"SOUR{chan}:BURS:STAT BURST")
+        cmds.append(f"SOUR{chan}:BURS:NCYC {ncyc}")
+        cmds.append(f"SOUR{chan}:BURS:NOR {nor}")
+
+        if period is not None:
+            cmds.append(f"SOUR{chan}:BURS:INT:PER {period}")
+    else:
+        cmds.append(f"SOUR{chan}:BURS:STAT CONTINUOUS")
+
+    cmds.append(f"SOUR{chan}:TRIG:SOUR {trig.upper()}")
+
+    return cmds
+
+
+def acq_query(
+    chan: int,
+    start: int = None,
+    end: int = None,
+    num_samples: int = None,
+    old: bool = False,
+    lat: bool = False,
+    input4: bool = False
+) -> str:
+    """
+    Check the readout options and return the data query for them.
+    Parameters and raised errors are the same as for scpi.acq_data.
+    """
+
+    low_lim = 0
+    up_lim = 16384
+
+    # Check input data for errors
+    if input4:
+        try:
+            assert chan in (1,2,3,4)
+        except AssertionError as chanel_err:
+            raise ValueError("Channel needs to be either 1, 2, 3 or 4") from chanel_err
+    else:
+        try:
+            assert chan in (1,2)
+        except AssertionError as chanel_err:
+            raise ValueError("Channel needs to be either 1 or 2") from chanel_err
+
+    try:
+        assert not((old is True) and (lat is True))
+    except AssertionError as arg_err:
+        raise ValueError("Please select only one. 'old' and 'lat' cannot be True at the same time.") from arg_err
+
+    if start is not None:
+        try:
+            assert 16384 >= start >= 0
+        except AssertionError as start_err:
+            raise ValueError(f"Start position out of range {low_lim, up_lim}") from start_err
+
+    if end is not None:
+        try:
+            assert 16384 >= end >= 0
+        except AssertionError as end_err:
+            raise ValueError(f"End position out of range {low_lim, up_lim}") from end_err
+
+    if num_samples is not None:
+        try:
+            assert 16384 >= num_samples >= 0
+        except AssertionError as sample_err:
+            raise ValueError(f"Sample number out of range {low_lim, up_lim}") from sample_err
+
+    # Determine the output data
+    if(start is not None) and (end is not None):
+        return f"ACQ:SOUR{chan}:DATA:STA:END? {start},{end}"
+
+    elif(start is not None) and (num_samples is not None):
+        return f"ACQ:SOUR{chan}:DATA:STA:N? {start},{num_samples}"
+
+    elif old and (num_samples is not None):
+        return f"ACQ:SOUR{chan}:DATA:OLD:N? {num_samples}"
+
+    elif lat and (num_samples is not None):
+        return f"ACQ:SOUR{chan}:DATA:LAT:N? {num_samples}"
+
+    else:
+        return f"ACQ:SOUR{chan}:DATA?"
+
+
+def acq_decode(reply, units: str, binary: bool = False, convert: bool = False):
+    """
+    Convert a data reply (rx_arb block or rx_txt string) the way scpi.acq_data does.
+    """
+
+    if binary:
+        buff_byte = reply
+
+        if convert:
+            # Decode the big-endian samples straight from the receive buffer
+            if units == "VOLTS":
+                buff = np.frombuffer(buff_byte, dtype='>f4').astype(np.float32)
+            elif units == "RAW":
+                buff = np.frombuffer(buff_byte, dtype='>i2').astype(np.int16)
+        else:
+            buff = bytes(buff_byte)
+    else:
+        buff_string = reply
+
+        if convert:
+            buff_string = buff_string.strip('{}\n\r').replace("  ", "").split(',')
+            buff = list(map(float, buff_string))
+        else:
+            buff = buff_string
+
+    return buff
+
+
+def acq_decode_into(reply, units: str, out: np.ndarray):
+    """
+    Decode a binary data block (rx_arb) into the preallocated array out.
+    """
+
+    out[...] = np.frombuffer(reply, dtype=ACQ_WIRE_DTYPE[units])
+    return out
+
+class scpi_batch (object):
+    """Command pipeline on a scpi connection, see scpi.batch()."""
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._outer = False
+        self.responses = []
+
+    def __enter__(self):
+        if self._conn._tx_queue is None:
+            self._conn._tx_queue = []
+            self._conn._rx_queue = []
+            self._outer = True
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self._outer:
+            return False
+        sent = not self._conn._tx_queue
+        try:
+            if exc_type is None:
+                self._conn._flush()
+                sent = True
+        finally:
+            # the shadow recorded the queued settings when they were queued,
+            # after a dropped or failed queue the board state is unknown
+            if not sent and self._conn.shadow is not None:
+                self._conn.shadow.invalidate()
+            self._conn._tx_queue = None
+            self._conn._rx_queue = None
+        return False
+
+    def tx_txt(self, msg):
+        """Queue a command."""
+        self._conn.tx_txt(msg)
+
+    def query(self, msg, reader=None):
+        """Queue a query, its reply lands in responses at the returned index.
+        reader is called to receive the reply, defaults to rx_txt.
+        """
+        self._conn.tx_txt(msg)
+        self.responses.append(None)
+        idx = len(self.responses) - 1
+        self._conn._rx_queue.append((self, idx, reader or self._conn.rx_txt))
+        return idx
+
+    def flush(self):
+        """Send what is queued so far and read the pending replies."""
+        self._conn._flush()
+        return self.responses
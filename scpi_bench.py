@@ -0,0 +1,72 @@
+"""Receive throughput of redpitaya_scpi against the local SCPI stand-in.
+
+Compares the previous recv()/concatenation receive code with the
+recv_into based engine for binary (rx_arb) and ASCII (rx_txt) readouts.
+"""
+
+import time
+import redpitaya_scpi as scpi
+from scpi_sim import ScpiSim
+
+
+def legacy_rx_txt(sock, chunksize=4096):
+    msg = ""
+    while 1:
+        chunk = sock.recv(chunksize).decode("utf-8")
+        msg += chunk
+        if len(msg) > 2 and msg[-2:] == "\r\n":
+            return msg[:-2]
+
+
+def legacy_rx_arb(sock):
+    data = b""
+    while len(data) != 1:
+        data = sock.recv(1)
+    if data != b"#":
+        return False
+    data = b""
+    while len(data) != 1:
+        data = sock.recv(1)
+    numOfNumBytes = int(data)
+    data = b""
+    while len(data) != numOfNumBytes:
+        data += sock.recv(1)
+    numOfBytes = int(data)
+    data = b""
+    while len(data) < numOfBytes:
+        r_size = min(numOfBytes - len(data), 4096)
+        data += sock.recv(r_size)
+    sock.recv(2)
+    return data
+
+
+def run(rp_s, receive, query, repeat):
+    nbytes = 0
+    t0 = time.perf_counter()
+    for i in range(repeat):
+        rp_s.tx_txt(query)
+        nbytes += len(receive())
+    dt = time.perf_counter() - t0
+    return nbytes / dt / 1e6
+
+
+if __name__ == "__main__":
+    repeat = 200
+    query = "ACQ:SOUR1:DATA?"
+
+    with ScpiSim() as sim:
+        rp_s = scpi.scpi(sim.host, port=sim.port)
+        sock = rp_s._socket
+
+        for fmt, legacy, current in (
+            ("BIN", lambda: legacy_rx_arb(sock), rp_s.rx_arb),
+            ("ASCII", lambda: legacy_rx_txt(sock), rp_s.rx_txt),
+        ):
+            rp_s.tx_txt("ACQ:DATA:FORMAT " + fmt)
+            before = run(rp_s, legacy, query, repeat)
+            after = run(rp_s, current, query, repeat)
+            print(
+                f"{fmt:<6} before {before:8.1f} MB/s   after {after:8.1f} MB/s"
+                f"   x{after / before:.1f}"
+            )
+        rp_s.close()
@@ -0,0 +1,178 @@
+"""Local stand-in for the Red Pitaya SCPI server.
+
+Answers the subset of commands used by redpitaya_scpi and RedCtl with
+synthetic data, so transport code can be exercised without a board:
+
+    sim = ScpiSim()
+    sim.start()
+    rp_c = redpctl.RedCtl(ip=sim.host, port=sim.port)
+    ...
+    sim.stop()
+"""
+
+import socket
+import socketserver
+import threading
+import numpy as np
+
+BUFF_SIZE = 16384
+
+
+def sine_source(chan, num, fs=125e6, freq=250e3, ampl=0.5, noise=0.005):
+    """Default synthetic capture, a noisy sine with a channel dependent phase."""
+    t = np.arange(num) / fs
+    x = ampl * np.sin(2 * np.pi * freq * t + (chan - 1) * np.pi / 2)
+    return x + noise * np.random.standard_normal(num)
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        sim = self.server.sim
+        sock = self.request
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        pending = b""
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                return
+            pending += chunk
+            *lines, pending = pending.split(b"\r\n")
+            out = []
+            for line in lines:
+                reply = sim.command(line.decode("utf-8"))
+                if reply is not None:
+                    out.append(reply)
+            if out:
+                sock.sendall(b"".join(out))
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class ScpiSim:
+    """Threaded SCPI stand-in server listening on localhost.
+
+    parameters:
+        port   - TCP port, 0 picks a free one
+        source - callable(chan, num) returning the samples of one capture
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, source=sine_source):
+        self.source = source
+        self.settings = {
+            "ACQ:DATA:UNITS": "VOLTS",
+            "ACQ:DATA:FORMAT": "ASCII",
+            "ACQ:DEC": "1",
+        }
+        self.log = []
+        self.captures = 0
+        self._buff = {}
+        self._replies = {}
+        self._server = _Server((host, port), _Handler)
+        self._server.sim = self
+        self.host, self.port = self._server.server_address
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def capture(self):
+        """Refill the simulated acquisition buffer of both channels."""
+        self.captures += 1
+        self._replies = {}
+        for chan in (1, 2):
+            self._buff[chan] = np.asarray(self.source(chan, BUFF_SIZE), dtype=np.float32)
+
+    def data(self, chan, start=0, num=BUFF_SIZE):
+        if chan not in self._buff:
+            self.capture()
+        idx = (start + np.arange(num)) % BUFF_SIZE
+        return self._buff[chan][idx]
+
+    def format(self, samples):
+        """Encode samples the way the board does for the current format/units."""
+        if self.settings["ACQ:DATA:UNITS"] == "RAW":
+            samples = np.round(samples * 8192).astype(">i2")
+        else:
+            samples = samples.astype(">f4")
+        if self.settings["ACQ:DATA:FORMAT"] == "BIN":
+            payload = samples.tobytes()
+            size = str(len(payload)).encode()
+            return b"#" + str(len(size)).encode() + size + payload + b"\r\n"
+        text = ",".join(str(float(v)) for v in samples)
+        return ("{" + text + "}\r\n").encode("utf-8")
+
+    def _data_reply(self, header, arg):
+        chan = int(header[8])
+        args = [int(float(a)) for a in arg.split(",") if a]
+        if header.endswith("DATA:STA:N?"):
+            samples = self.data(chan, args[0], args[1])
+        elif header.endswith("DATA:STA:END?"):
+            samples = self.data(chan, args[0], (args[1] - args[0]) % BUFF_SIZE)
+        elif header.endswith("DATA:OLD:N?"):
+            samples = self.data(chan, 0, args[0])
+        elif header.endswith("DATA:LAT:N?"):
+            samples = self.data(chan, BUFF_SIZE - args[0], args[0])
+        else:
+            samples = self.data(chan)
+        return self.format(samples)
+
+    def command(self, line):
+        """Execute one command line, return the encoded reply or None."""
+        self.log.append(line)
+        header, _, arg = line.partition(" ")
+        header = header.upper()
+
+        if not header.endswith("?"):
+            if header in ("ACQ:START", "ACQ:TRIG"):
+                self.capture()
+            elif header == "ACQ:RST":
+                self.settings["ACQ:DATA:UNITS"] = "VOLTS"
+                self.settings["ACQ:DATA:FORMAT"] = "ASCII"
+            self.settings[header] = arg.upper()
+            return None
+
+        if header.startswith("ACQ:SOUR") and ":DATA" in header:
+            # Encoding dominates for ASCII, repeated readouts of one capture reuse it
+            key = (line, self.settings["ACQ:DATA:UNITS"], self.settings["ACQ:DATA:FORMAT"])
+            if key not in self._replies:
+                self._replies[key] = self._data_reply(header, arg)
+            return self._replies[key]
+
+        if header == "ACQ:TRIG:STAT?":
+            reply = "TD"
+        elif header == "ACQ:TRIG:FILL?":
+            reply = "1"
+        elif header in ("ACQ:TPOS?", "ACQ:WPOS?"):
+            reply = str(BUFF_SIZE // 2)
+        elif header == "*IDN?":
+            reply = "REDPITAYA,SIM,0,0"
+        else:
+            reply = self.settings.get(header[:-1], "0")
+        return (reply + "\r\n").encode("utf-8")
+
+
+if __name__ == "__main__":
+    import time
+
+    with ScpiSim(port=5000) as sim:
+        print(f"SCPI stand-in listening on {sim.host}:{sim.port}")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
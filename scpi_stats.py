@@ -0,0 +1,158 @@
+"""Opt-in per-command instrumentation of the SCPI transport.
+
+    rp_c.rp_s.stats = ScpiStats()
+    ... run tests ...
+    print(rp_c.rp_s.stats.summary("origin"))
+    rp_c.rp_s.stats.to_json("scpi_stats.json")
+
+Every tx_txt, rx_txt and rx_arb is recorded with the command mnemonic, the
+time spent in the call, bytes sent/received and the caller. For replies the
+round trip time since the query was sent is recorded as well. caller is the
+innermost function outside the transport (e.g. RedCtl.send_spi_msc), origin
+the first one outside RedCtl and the trigger poller (e.g. DAC70501.send_24bit_int).
+"""
+
+import csv
+import json
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+FIELDS = ("op", "mnemonic", "t", "dt", "rtt", "tx_bytes", "rx_bytes", "caller", "origin")
+
+# modules whose frames are skipped when looking for the caller / origin
+TRANSPORT = ("redpitaya_scpi", "redpitaya_async", "scpi_stats", "shadow")
+DRIVER = ("redpctl", "trigger")
+
+
+def mnemonic(msg):
+    """Command header without arguments, e.g. 'ACQ:SOUR1:DATA:OLD:N?'."""
+    return msg.strip().partition(" ")[0].upper()
+
+
+def _name(frame):
+    code = frame.f_code
+    return getattr(code, "co_qualname", code.co_name)
+
+
+def _callers(depth=2):
+    frame = sys._getframe(depth)
+    caller = origin = None
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module not in TRANSPORT:
+            if caller is None:
+                caller = _name(frame)
+            if module not in DRIVER:
+                origin = _name(frame)
+                break
+        frame = frame.f_back
+    return caller or "", origin or caller or ""
+
+
+class ScpiStats:
+    """Recorder for SCPI transport calls, keeps the last `history` records."""
+
+    def __init__(self, history=200000):
+        self.records = deque(maxlen=history)
+        self._pending = deque()
+        self.t0 = time.perf_counter()
+
+    def _add(self, op, name, dt, rtt, tx_bytes, rx_bytes):
+        caller, origin = _callers(3)
+        self.records.append(
+            (op, name, time.perf_counter() - self.t0, dt, rtt, tx_bytes, rx_bytes, caller, origin)
+        )
+
+    def tx(self, msg, nbytes, dt):
+        """A command was sent (dt > 0) or queued in a batch (dt == 0)."""
+        name = mnemonic(msg)
+        if name.endswith("?"):
+            self._pending.append((name, time.perf_counter()))
+        self._add("tx", name, dt, 0.0, nbytes, 0)
+
+    def flush(self, ncmds, nbytes, dt):
+        """A batch of ncmds commands went out in one write."""
+        self._add("flush", "<batch %d>" % ncmds, dt, 0.0, nbytes, 0)
+
+    def rx(self, op, nbytes, dt):
+        """A reply was received, it belongs to the oldest unanswered query."""
+        if self._pending:
+            name, sent = self._pending.popleft()
+            rtt = time.perf_counter() - sent
+        else:
+            name, rtt = "?", dt
+        self._add(op, name, dt, rtt, 0, nbytes)
+
+    def clear(self):
+        self.records.clear()
+        self._pending.clear()
+        self.t0 = time.perf_counter()
+
+    def column(self, field):
+        i = FIELDS.index(field)
+        return [r[i] for r in self.records]
+
+    def summary(self, key="mnemonic"):
+        """Aggregates per key (mnemonic, caller, origin or op), sorted by total time."""
+        k = FIELDS.index(key)
+        agg = {}
+        for r in self.records:
+            a = agg.setdefault(r[k], [0, 0.0, 0.0, 0, 0])
+            a[0] += 1
+            a[1] += r[3]
+            a[2] = max(a[2], r[3])
+            a[3] += r[5]
+            a[4] += r[6]
+        rows = [
+            {
+                key: name,
+                "count": a[0],
+                "time": a[1],
+                "mean": a[1] / a[0],
+                "max": a[2],
+                "tx_bytes": a[3],
+                "rx_bytes": a[4],
+            }
+            for name, a in agg.items()
+        ]
+        return sorted(rows, key=lambda r: r["time"], reverse=True)
+
+    def histogram(self, value=None, key="mnemonic", field="dt", bins=20):
+        """Histogram of field (dt or rtt) for records whose key equals value (all if None).
+        Returns (counts, bin_edges) like np.histogram.
+        """
+        k = FIELDS.index(key)
+        f = FIELDS.index(field)
+        data = np.array([r[f] for r in self.records if value is None or r[k] == value])
+        return np.histogram(data, bins=bins)
+
+    def histograms(self, key="mnemonic", field="dt", bins=20):
+        """{value: (counts, bin_edges)} for every distinct key value."""
+        values = {r[FIELDS.index(key)] for r in self.records}
+        return {v: self.histogram(v, key, field, bins) for v in values}
+
+    def to_csv(self, path):
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(FIELDS)
+            writer.writerows(self.records)
+
+    def to_json(self, path, key="mnemonic", bins=20, records=False):
+        out = {"summary": self.summary(key), "histograms": {}}
+        for name, (counts, edges) in self.histograms(key, "dt", bins).items():
+            out["histograms"][name] = {"counts": counts.tolist(), "edges": edges.tolist()}
+        if records:
+            out["records"] = [dict(zip(FIELDS, r)) for r in self.records]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(out, f, indent=1)
+
+    def print_summary(self, key="mnemonic", top=20):
+        print(f"{key:<32} {'count':>7} {'time s':>9} {'mean ms':>9} {'tx B':>9} {'rx B':>10}")
+        for r in self.summary(key)[:top]:
+            print(
+                f"{str(r[key]):<32} {r['count']:>7} {r['time']:>9.3f} "
+                f"{r['mean'] * 1e3:>9.3f} {r['tx_bytes']:>9} {r['rx_bytes']:>10}"
+            )
@@ -0,0 +1,64 @@
+"""Settling deadlines instead of fixed sleeps.
+
+Drivers declare how long the hardware needs after an operation:
+
+    self.bus.settle.require("dac", 0.1)
+
+and return immediately. Requirements on the same domain merge into the
+later deadline, requirements on different domains run out in parallel. The
+caller only blocks where a later step depends on them, captures wait for
+all domains:
+
+    self.bus.settle.wait()          # before a measurement
+    self.bus.settle.wait("power")   # before talking to a freshly powered chip
+"""
+
+import time
+
+
+class Settle:
+    """Settling deadlines per domain plus the time they saved against sleeping."""
+
+    def __init__(self, clock=time.monotonic, sleep=time.sleep):
+        self.clock = clock
+        self.sleep = sleep
+        self.deadlines = {}
+        self.requested = 0.0  # sum of all requirements, what fixed sleeps would cost
+        self.waited = 0.0  # time actually spent blocking
+
+    def require(self, domain, seconds):
+        """domain needs seconds from now to settle."""
+        self.requested += seconds
+        deadline = self.clock() + seconds
+        if deadline > self.deadlines.get(domain, 0.0):
+            self.deadlines[domain] = deadline
+
+    def remaining(self, *domains):
+        """Time until the given domains (all if none) are settled."""
+        now = self.clock()
+        keys = domains or self.deadlines.keys()
+        return max([self.deadlines.get(d, now) - now for d in keys] + [0.0])
+
+    def wait(self, *domains):
+        """Block until the given domains (all if none) are settled."""
+        delay = self.remaining(*domains)
+        if delay > 0:
+            self.sleep(delay)
+            self.waited += delay
+        for d in domains or list(self.deadlines):
+            self.deadlines.pop(d, None)
+        return delay
+
+    @property
+    def saved(self):
+        return self.requested - self.waited
+
+    def reset_counters(self):
+        self.requested = 0.0
+        self.waited = 0.0
+
+    def report(self):
+        return (
+            f"settle: {self.requested:.2f} s required, {self.waited:.2f} s waited, "
+            f"{self.saved:.2f} s saved"
+        )
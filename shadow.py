@@ -0,0 +1,117 @@
+"""Mirror of the Red Pitaya settings written over SCPI.
+
+ShadowState remembers the last value sent for every acquisition, generator,
+DIO, I2C address and SPI setting. scpi.tx_txt asks it whether a command
+changes anything and drops the ones that do not; queries whose answer is
+already known are answered locally. Reset commands (*RST, ACQ:RST, GEN:RST,
+DIG:RST, SPI:RELEASE ...) forget the affected part of the mirror.
+"""
+
+import re
+
+# Commands that only set a value, header -> key
+_SETTING = re.compile(
+    r"^(ACQ:(?:DEC|AVG|TRIG:DLY|TRIG:DLY:NS|TRIG:LEV|TRIG:EXT:LEV|DATA:FORMAT|DATA:UNITS"
+    r"|SOUR\d:GAIN|SOUR\d:COUP)"
+    r"|SOUR\d:(?:FUNC|VOLT|VOLT:OFFS|FREQ:FIX|PHAS|DCYC|TRAC:DATA:DATA|BURS:STAT"
+    r"|BURS:NCYC|BURS:NOR|BURS:INT:PER|TRIG:SOUR)"
+    r"|OUTPUT\d:STATE|I2C:FMODE|SPI:INIT:DEV|SPI:SET:(?:MODE|CSMODE|SPEED|WORD))$"
+)
+
+# Reset commands and the key prefixes they invalidate
+RESETS = {
+    "*RST": ("",),
+    "ACQ:RST": ("ACQ:",),
+    "GEN:RST": ("SOUR", "OUTPUT"),
+    "DIG:RST": ("DIG:",),
+    "SPI:INIT": ("SPI:",),
+    "SPI:RELEASE": ("SPI:",),
+    "SPI:SET:DEF": ("SPI:SET:",),
+}
+
+# Queries answered from the mirror, the board echoes these values verbatim
+CACHED_QUERIES = ("ACQ:DATA:UNITS", "ACQ:DATA:FORMAT", "ACQ:DEC")
+
+
+def _keys(msg):
+    """Split a setting command into [(key, value)], empty if it is not a setting."""
+    header, _, arg = msg.strip().partition(" ")
+    header = header.upper()
+    if header == "DIG:PIN":
+        pin, _, value = arg.partition(",")
+        return [("DIG:PIN " + pin.upper(), value)]
+    if header == "DIG:PIN:DIR":
+        direction, _, pin = arg.partition(",")
+        return [("DIG:PIN:DIR " + pin.upper(), direction.upper())]
+    if header.startswith("I2C:DEV"):
+        return [("I2C:DEV", header[7:] + " " + arg)]
+    if header == "OUTPUT:STATE":
+        return [("OUTPUT1:STATE", arg.upper()), ("OUTPUT2:STATE", arg.upper())]
+    if _SETTING.match(header):
+        return [(header, arg)]
+    return []
+
+
+class ShadowState:
+    """Last written device settings plus counters of the traffic it saved."""
+
+    def __init__(self):
+        self.values = {}
+        self.saved_writes = 0
+        self.saved_queries = 0
+
+    def invalidate(self, prefix=""):
+        """Forget every setting whose key starts with prefix (all by default)."""
+        for key in [k for k in self.values if k.startswith(prefix)]:
+            del self.values[key]
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def known(self, key):
+        return key in self.values
+
+    def filter(self, msg):
+        """Return True if msg has to be sent, record its effect on the mirror."""
+        header = msg.strip().partition(" ")[0].upper()
+        if header in RESETS:
+            for prefix in RESETS[header]:
+                self.invalidate(prefix)
+            return True
+
+        keys = _keys(msg)
+        if not keys:
+            return True
+        if all(self.values.get(k) == v for k, v in keys):
+            self.saved_writes += 1
+            return False
+        self.values.update(keys)
+        return True
+
+    def answer(self, query):
+        """Known answer to a query or None if it has to go to the board."""
+        key = query.strip().rstrip("?").upper()
+        if key in CACHED_QUERIES and key in self.values:
+            self.saved_queries += 1
+            return self.values[key]
+        return None
+
+    def learn(self, query, reply):
+        """Store the reply to a query of a cached setting."""
+        key = query.strip().rstrip("?").upper()
+        if key in CACHED_QUERIES:
+            self.values[key] = reply
+
+    @property
+    def saved(self):
+        return self.saved_writes + self.saved_queries
+
+    def reset_counters(self):
+        self.saved_writes = 0
+        self.saved_queries = 0
+
+    def report(self):
+        return (
+            f"SCPI shadow: {self.saved_writes} writes and "
+            f"{self.saved_queries} queries suppressed"
+        )
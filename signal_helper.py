@@ -1,17 +1,73 @@
 import numpy as np
 import time
 import scipy
-from scipy.signal import butter, lfilter, sosfilt, sosfreqz, filtfilt
-from scipy.signal import hilbert, find_peaks, peak_widths, argrelextrema
+from functools import lru_cache
+from scipy.signal import butter, sosfilt, sosfiltfilt, sosfilt_zi, sosfreqz
+from scipy.signal import find_peaks, peak_widths, argrelextrema
+from envelope import distance_envelope, chunk_extrema
+from features import peak_features, edge_levels
+from edges import EdgeDetector
+
+
+@lru_cache(maxsize=256)
+def _butter_sos(btype, cutoff, fs, order):
+    return butter(order, cutoff, fs=fs, btype=btype, output="sos")
+
+
+def butter_sos(btype, cutoff, fs, order=5):
+    """Cached Butterworth design in second-order sections.
+    cutoff is a frequency or a (low, high) pair for band filters, in Hz.
+    The returned array is shared between callers, do not modify it.
+    """
+    if np.ndim(cutoff):
+        cutoff = tuple(float(c) for c in np.ravel(cutoff))
+    else:
+        cutoff = float(cutoff)
+    return _butter_sos(btype, cutoff, float(fs), int(order))
+
+
+def sos_filter(data, sos, axis=-1, zero_phase=False):
+    """Filter data along axis, a 2-D capture array is filtered row by row in one call.
+    zero_phase runs the filter forward and backward (sosfiltfilt).
+    """
+    if zero_phase:
+        return sosfiltfilt(sos, data, axis=axis)
+    return sosfilt(sos, data, axis=axis)
+
+
+class SOSStream:
+    """Chunked filtering, the filter state is carried from one chunk to the next.
+
+    The state starts at the steady state of the first sample, chunks may be
+    2-D with the time axis given by axis.
+    """
+
+    def __init__(self, sos, axis=-1):
+        self.sos = sos
+        self.axis = axis
+        self.zi = None
+
+    def reset(self):
+        self.zi = None
+
+    def __call__(self, chunk):
+        chunk = np.asarray(chunk)
+        if self.zi is None:
+            shape = [1] * chunk.ndim
+            shape[self.axis] = 2
+            zi = sosfilt_zi(self.sos).reshape((len(self.sos),) + tuple(shape))
+            self.zi = zi * np.take(chunk, [0], axis=self.axis)[None]
+        y, self.zi = sosfilt(self.sos, chunk, axis=self.axis, zi=self.zi)
+        return y
 
 
 def butter_bandpass(lowcut, highcut, fs, order=5):
     return butter(order, [lowcut, highcut], fs=fs, btype="band")
 
 
-def butter_bandpass_filter(data, lowcut, highcut, fs, order=5):
-    b, a = butter_bandpass(lowcut, highcut, fs, order=order)
-    y = lfilter(b, a, data)
+def butter_bandpass_filter(data, lowcut, highcut, fs, order=5, axis=-1):
+    sos = butter_sos("band", (lowcut, highcut), fs, order)
+    y = sosfilt(sos, data, axis=axis)
     return y
 
 
@@ -22,9 +78,9 @@ def butter_highpass(cutoff, fs, order=5):
     return b, a
 
 
-def butter_highpass_filter(data, cutoff, fs, order=5):
-    b, a = butter_highpass(cutoff, fs, order=order)
-    y = filtfilt(b, a, data)
+def butter_highpass_filter(data, cutoff, fs, order=5, axis=-1):
+    sos = butter_sos("high", cutoff, fs, order)
+    y = sosfiltfilt(sos, data, axis=axis)
     return y
 
 
@@ -32,9 +88,9 @@ def butter_lowpass(cutoff, fs, order=5):
     return butter(order, cutoff, fs=fs, btype="low", analog=False)
 
 
-def butter_lowpass_filter(data, cutoff, fs, order=5):
-    b, a = butter_lowpass(cutoff, fs, order=order)
-    y = lfilter(b, a, data)
+def butter_lowpass_filter(data, cutoff, fs, order=5, axis=-1):
+    sos = butter_sos("low", cutoff, fs, order)
+    y = sosfilt(sos, data, axis=axis)
     return y
 
 
@@ -43,15 +99,11 @@ class SOS:
         pass
 
     def butter_bandpass(self, lowcut, highcut, fs, order=5):
-        nyq = 0.5 * fs
-        low = lowcut / nyq
-        high = highcut / nyq
-        sos = butter(order, [low, high], analog=False, btype="band", output="sos")
-        return sos
+        return butter_sos("band", (lowcut, highcut), fs, order)
 
-    def butter_bandpass_filter(self, data, lowcut, highcut, fs, order=5):
+    def butter_bandpass_filter(self, data, lowcut, highcut, fs, order=5, axis=-1):
         sos = self.butter_bandpass(lowcut, highcut, fs, order=order)
-        y = sosfilt(sos, data)
+        y = sosfilt(sos, data, axis=axis)
         return y
 
 
@@ -66,86 +118,85 @@ def chirp_l(
     return t, x0
 
 
-def gen_signals_sequence(frequencies, duration=0.0001, sample_rate=10e6):
-    # Initialize signal and time arrays
-    signal = np.array([])
-    t = np.array([])
-
-    # Initialize phase
-    phase = 0
-
-    # Generate signals
-    for i, freq in enumerate(frequencies):
-        t_i = np.arange(
-            i * duration, (i + 1) * duration, 1 / sample_rate
-        )  # Time array for current signal
-        signal_i = np.sin(
-            2 * np.pi * freq * (t_i - i * duration) + phase
-        )  # Generate signal with phase shift
-        phase += 2 * np.pi * freq * duration  # Update phase for next signal
-
-        # Concatenate current signal and time array to the total signal and time arrays
-        signal = np.concatenate((signal, signal_i))
-        t = np.concatenate((t, t_i))
-
-    return t, signal
+def gen_signals_sequence(frequencies, duration=0.0001, sample_rate=10e6, size=None, out=None):
+    """Phase continuous sine sequence, one segment per frequency.
+
+    parameters:
+        frequencies - segment frequencies in Hz
+        duration    - segment length in s, scalar or one per segment
+        sample_rate - samples per s
+        size        - total number of samples, e.g. 16384 for the AWG buffer;
+                      the sequence is then synthesised at size / total duration
+                      instead of sample_rate, the AWG plays it back with
+                      frequency 1 / total duration, i.e.
+                      RedCtl.arbitrary(signal, duration=total duration)
+        out         - float64 array of shape (n,) to write into, n the total
+                      number of samples
+
+    Segment i has exactly round(end_i * rate) - round(start_i * rate) samples,
+    the phase carries over from one segment to the next. Returns (t, signal),
+    empty when the sequence rounds to no samples.
+    """
+    frequencies = np.asarray(frequencies, dtype=float)
+    durations = np.broadcast_to(np.asarray(duration, dtype=float), frequencies.shape)
+    ends = np.cumsum(durations)
+    if size is not None and ends.size:
+        sample_rate = size / ends[-1]
+    bounds = np.round(np.concatenate(([0.0], ends)) * sample_rate).astype(np.int64)
+    counts = np.diff(bounds)
+    n = int(bounds[-1])
+
+    if out is None:
+        out = np.empty(n)
+    elif out.shape != (n,) or out.dtype != np.float64:
+        raise ValueError(f"out must be a float64 array of shape ({n},), not {out.dtype} {out.shape}")
+    if n == 0:
+        return np.zeros(0), out
+    # phase of sample k is 2*pi/fs times the sum of the frequencies of samples before k
+    out[0] = 0
+    np.cumsum(np.repeat(frequencies, counts)[:-1], out=out[1:])
+    out *= 2 * np.pi / sample_rate
+    np.sin(out, out=out)
+    return np.arange(n) / sample_rate, out
 
 
 # frequencies = [100e3, 150e3, 200e3, 250e3, 300e3]  # List of frequencies
 # t, signal = gen_signals_sequence(frequencies)
 
 
-def x_edge(data, thresh=0.2):
-    mask1 = (data[:-1] < thresh) & (data[1:] > thresh)
-    mask2 = (data[:-1] > thresh) & (data[1:] < thresh)
-    rising_edge = np.flatnonzero(mask1) + 1
-    falling_edge = np.flatnonzero(mask2) + 1
-    return rising_edge, falling_edge
+def x_edge(data, thresh=0.2, lo=None, min_width=0):
+    """Rising and falling edges through thresh, index of the first sample past it.
+
+    Without lo and min_width an edge needs one sample strictly below and the
+    next strictly above thresh (or the reverse), samples equal to thresh make
+    no edge. lo adds hysteresis and min_width drops short pulses, both go
+    through edges.EdgeDetector, where a sample equal to thresh counts as high.
+    """
+    if lo is None and min_width == 0:
+        data = np.asarray(data)
+        mask1 = (data[:-1] < thresh) & (data[1:] > thresh)
+        mask2 = (data[:-1] > thresh) & (data[1:] < thresh)
+        return np.flatnonzero(mask1) + 1, np.flatnonzero(mask2) + 1
+    return EdgeDetector(thresh, lo, min_width)(data)
 
 
 def rising_edge(data, thresh):
-    sign = data >= thresh
-    pos = np.where(np.convolve(sign, [1, -1]) == 1)
-    return pos
+    rising, _ = EdgeDetector(thresh, state=False)(data)
+    return (rising,)
 
 
 def falling_edge(data, thresh):
-    sign = data >= thresh
-    pos = np.where(np.convolve(sign, [1, -1]) == -1)
-    return pos
+    detector = EdgeDetector(thresh, state=False)
+    _, falling = detector(data)
+    # a signal high at the end falls behind the last sample
+    if detector.state:
+        falling = np.append(falling, len(data))
+    return (falling,)
 
 
 def envelope(sig, distance=50):
-    # split signal into negative and positive parts
-    u_x = np.where(sig > 0)[0]
-    l_x = np.where(sig < 0)[0]
-    u_y = sig.copy()
-    u_y[l_x] = 0
-    l_y = -sig.copy()
-    l_y[u_x] = 0
-
-    # find upper and lower peaks
-    u_peaks, _ = scipy.signal.find_peaks(u_y, distance=distance)
-    l_peaks, _ = scipy.signal.find_peaks(l_y, distance=distance)
-
-    # use peaks and peak values to make envelope
-    u_x = u_peaks
-    u_y = sig[u_peaks]
-    l_x = l_peaks
-    l_y = sig[l_peaks]
-
-    # add start and end of signal to allow proper indexing
-    end = len(sig)
-    u_x = np.concatenate((u_x, [0, end]))
-    u_y = np.concatenate((u_y, [0, 0]))
-    l_x = np.concatenate((l_x, [0, end]))
-    l_y = np.concatenate((l_y, [0, 0]))
-
-    # create envelope functions
-    u = scipy.interpolate.interp1d(u_x, u_y)
-    l = scipy.interpolate.interp1d(l_x, l_y)
-    # return u, l
-    return u(np.arange(end))
+    """Upper envelope of the positive half of sig, sig may be a batch (..., samples)."""
+    return distance_envelope(sig, distance, floor=0)
 
 
 def hl_envelopes_idx(s, dmin=1, dmax=1, split=False):
@@ -172,26 +223,15 @@ def hl_envelopes_idx(s, dmin=1, dmax=1, split=False):
         lmax = lmax[s[lmax] > s_mid]
 
     # global min of dmin-chunks of locals min
-    lmin = lmin[
-        [i + np.argmin(s[lmin[i : i + dmin]]) for i in range(0, len(lmin), dmin)]
-    ]
+    lmin = chunk_extrema(s, lmin, dmin, np.argmin)
     # global max of dmax-chunks of locals max
-    lmax = lmax[
-        [i + np.argmax(s[lmax[i : i + dmax]]) for i in range(0, len(lmax), dmax)]
-    ]
+    lmax = chunk_extrema(s, lmax, dmax, np.argmax)
     return lmin, lmax
 
 
 def envelope_fft(sig, distance=50):
-    u_y = sig.copy()
-    u_peaks, _ = scipy.signal.find_peaks(u_y, distance=distance)
-    u_x = u_peaks
-    u_y = sig[u_peaks]
-    end = len(sig)
-    u_x = np.concatenate((u_x, [0, end]))
-    u_y = np.concatenate((u_y, [0, 0]))
-    f = scipy.interpolate.interp1d(u_x, u_y)
-    return f(np.arange(end))
+    """Upper envelope of sig through its peaks, sig may be a batch (..., samples)."""
+    return distance_envelope(sig, distance)
 
 
 def voltage_divider(voltage):
@@ -218,6 +258,10 @@ def CQ_330E(voltage):
     return (voltage - Zero_Current) / Sensitivity
 
 
+# (R1 + R2) / R2 of the PRE input divider, R1 = 6200, R2 = 2700
+PRE_DIVIDER = (6200 + 2700) / 2700
+
+
 def voltage_divider_pre(voltage):
     """
     Vout = Vin * R2 / (R1 + R2)
@@ -225,10 +269,7 @@ def voltage_divider_pre(voltage):
     R1 = R2 * (Vin - Vout) / Vout
     R2 = R1 * Vout / (Vin – Vout)
     """
-    R1 = 6200
-    R2 = 2700
-    voltage = voltage * ((R1 + R2) / R2)
-    return voltage
+    return voltage * PRE_DIVIDER
 
 def voltage_divider_KV(ch, voltage):
     if ch == 2:
@@ -251,13 +292,92 @@ def rms(voltage):
     # return np.sqrt(voltage.dot(voltage)/voltage.size)
 
 
+def levels(voltage, scale=1.0, ref=None, chunk=1 << 16):
+    """RMS, peak, min, max, mean, p2p, crest and dB of a capture in one pass.
+
+    parameters:
+        voltage - raw capture (samples,) or batch (..., samples)
+        scale   - calibration factor applied to the results, e.g. PRE_DIVIDER,
+                  the capture itself is not scaled
+        ref     - reference for db = ratio_db(rms, ref), None leaves db out
+        chunk   - samples per pass, bounds the temporaries
+
+    Sums, sum of squares and extremes are accumulated chunk by chunk in float64.
+    Returns a dict of floats for one capture, of arrays of shape (...) for a batch.
+    """
+    x = np.asarray(voltage)
+    n = x.shape[-1]
+    s1 = np.zeros(x.shape[:-1])
+    s2 = np.zeros(x.shape[:-1])
+    lo = np.full(x.shape[:-1], np.inf)
+    hi = np.full(x.shape[:-1], -np.inf)
+    for i in range(0, n, chunk):
+        c = x[..., i : i + chunk]
+        s1 += np.add.reduce(c, axis=-1, dtype=np.float64)
+        s2 += np.einsum("...i,...i->...", c, c, dtype=np.float64)
+        np.minimum(lo, c.min(axis=-1), out=lo)
+        np.maximum(hi, c.max(axis=-1), out=hi)
+
+    mean = s1 / n * scale
+    rms = np.sqrt(s2 / n) * abs(scale)
+    lo, hi = (lo * scale, hi * scale) if scale >= 0 else (hi * scale, lo * scale)
+    peak = np.maximum(np.abs(lo), np.abs(hi))
+    result = {
+        "rms": rms,
+        "peak": peak,
+        "min": lo,
+        "max": hi,
+        "mean": mean,
+        "p2p": hi - lo,
+        "crest": peak / rms,
+    }
+    if ref is not None:
+        result["db"] = ratio_db(rms, ref)
+    if x.ndim == 1:
+        result = {k: float(v) for k, v in result.items()}
+    return result
+
+
+def windowed_rms(voltage, window=100, axis=-1):
+    """RMS of every window of `window` samples along axis, one cumsum pass.
+    Element i covers voltage[i:i + window].
+    """
+    x = np.moveaxis(np.asarray(voltage, dtype=float), axis, -1)
+    c = np.cumsum(np.square(x), axis=-1)
+    c = np.concatenate([np.zeros(c.shape[:-1] + (1,)), c], axis=-1)
+    ms = (c[..., window:] - c[..., :-window]) / window
+    return np.moveaxis(np.sqrt(np.maximum(ms, 0)), -1, axis)
+
+
+def settled_region(voltage, thresh=0.01, window=100, min_len=None, periodic=True):
+    """Slice of the settled end of a capture or None.
+
+    The windowed RMS is compared with its median over the second half of the
+    capture, the region starts after the last window deviating by thresh or
+    more. With periodic the window is stretched to whole periods of the
+    strongest spectral line so a sine does not ripple the RMS. None if the
+    region is shorter than min_len samples (default 2 windows).
+    """
+    voltage = np.asarray(voltage)
+    if periodic:
+        spectrum = np.abs(np.fft.rfft(voltage - np.mean(voltage)))
+        k = int(np.argmax(spectrum[1:])) + 1
+        period = len(voltage) / k
+        window = int(round(np.ceil(window / period) * period))
+    r = windowed_rms(voltage, window)
+    ref = np.median(r[len(r) // 2 :])
+    bad = np.flatnonzero(np.abs(r - ref) >= thresh)
+    start = bad[-1] + 1 if bad.size else 0
+    if min_len is None:
+        min_len = 2 * window
+    if len(voltage) - start < min_len:
+        return None
+    return slice(start, len(voltage))
+
+
 def find_max_level(voltage, thresh=0.2, width=20):
-    rising_edge, falling_edge = x_edge(voltage, thresh)
-    level = []
-    for i in falling_edge:
-        if voltage[i - width * 2] > 0:
-            level.append(voltage[i - width * 2 : i - width])
-    return np.mean(np.array(level))  # np.max(np.array(level))
+    level = edge_levels(voltage, thresh, width)["level"]
+    return np.mean(level)  # np.max(level)
 
 
 def percentage_change(previous, current):
@@ -285,18 +405,8 @@ def find_widths(y, width=700, idx=0):
 
 
 def find_widths_min(y, width=700, delta=1000):
-    peaks, _ = find_peaks(y, width=width)
-    idx = []
-    for i in peaks:
-        if i > delta:
-            arr_l = y[i - delta : i]
-            arr_r = y[i : i + delta]
-            min_l = np.min(arr_l)
-            min_r = np.min(arr_r)
-            l_idx = np.where(arr_l == min_l)[0]
-            r_idx = np.where(arr_r == min_r)[0]
-            idx.append([i - l_idx[0], i + r_idx[0], i])
-    return idx
+    f = peak_features(y, width, delta)
+    return np.column_stack((f["left_min"], f["right_min"], f["peak"])).tolist()
 
 
 def near_peak(y, L, R):
@@ -26,8 +26,8 @@ if __name__ == "__main__":
                 print(f"turn channel {key}")
                 rp_c.set_ch(value)
                 time.sleep(0.1)
-                data = rp_c.read(counter=nrows, quantity=rx_buffer_size)
-                data = np.array(data)
+                # (channels, quantity) of the first shot, no copy
+                data = rp_c.read_block(counter=nrows, quantity=rx_buffer_size)[0]
                 real_current = np.real(sh.CQ_330E(voltage=data[1]))
                 real_voltage = np.real(sh.voltage_divider_KV(value, data[0]))
 
@@ -39,11 +39,12 @@ if __name__ == "__main__":
                     print("Something went wrong.")
                     continue
 
-                max_current = np.max(current_period)
+                max_current = sh.levels(current_period)["max"]
                 print(f"Max current: {max_current:.2f}")
-                max_voltage = np.max(voltage_period)
-                min_voltage = np.min(voltage_period)
-                peak_to_peak = max_voltage - min_voltage
+                voltage_levels = sh.levels(voltage_period)
+                max_voltage = voltage_levels["max"]
+                min_voltage = voltage_levels["min"]
+                peak_to_peak = voltage_levels["p2p"]
                 num_points = len(voltage_period)
                 duration = num_points / sample_rate
                 duration_milliseconds = duration * 1000
@@ -0,0 +1,206 @@
+"""Run the board test sequence on several Red Pitayas at once.
+
+Station configuration is a list with one entry per fixture, for example
+station.yaml:
+
+    - ip: 192.168.0.15
+      brd: SS
+    - ip: 192.168.0.16
+      dec: 1
+      trig: 0.2
+
+Keys besides ip are optional, brd is passed to the test class.
+"""
+
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import redpctl as redpctl
+from tests import TESTs
+
+
+class BoardOutput:
+    """stdout of the board threads, every line is prefixed with the board name.
+
+    Lines are collected per thread and written whole, so the prints of
+    boards running at the same time do not interleave within a line.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def board(self, name):
+        self.local.name = name
+        self.local.line = ""
+
+    def write(self, text):
+        name = getattr(self.local, "name", None)
+        if name is None:
+            return self.stream.write(text)
+        *lines, self.local.line = (self.local.line + text).split("\n")
+        if lines:
+            with self.lock:
+                self.stream.write("".join(f"{name:<18} {line}\n" for line in lines))
+        return len(text)
+
+    def flush(self):
+        name = getattr(self.local, "name", None)
+        if name is not None and self.local.line:
+            with self.lock:
+                self.stream.write(f"{name:<18} {self.local.line}")
+            self.local.line = ""
+        self.stream.flush()
+
+    def done(self):
+        self.flush()
+        self.local.name = None
+
+
+class Station:
+    """Opens one RedCtl session per board and runs a test class on each concurrently.
+
+    parameters:
+        config - list of dicts (ip, dec, trig, ch, port, aio, brd, name)
+        tests  - test class, TESTs or pre_tiny.PRE_TESTs
+    """
+
+    def __init__(self, config, tests=TESTs):
+        self.config = [dict(c) for c in config]
+        self.tests = tests
+        self.boards = []
+        self.results = []
+
+    def open(self):
+        self.boards = []
+        for cfg in self.config:
+            name = cfg.get("name", cfg["ip"])
+            if "name" not in cfg and cfg.get("port", 5000) != 5000:
+                name = f'{cfg["ip"]}:{cfg["port"]}'
+            bus = redpctl.RedCtl(
+                ip=cfg["ip"],
+                trig=cfg.get("trig", 0.2),
+                dec=cfg.get("dec", 1),
+                ch=cfg.get("ch", 1),
+                port=cfg.get("port", 5000),
+                aio=cfg.get("aio", False),
+            )
+            if "brd" in cfg:
+                T = self.tests(bus, cfg["brd"])
+            else:
+                T = self.tests(bus)
+            self.boards.append((name, bus, T))
+        return self
+
+    def run_board(self, name, bus, T):
+        """Run the test sequence on one board, the same loop as tests.py __main__."""
+        if isinstance(sys.stdout, BoardOutput):
+            sys.stdout.board(name)
+        start = time.perf_counter()
+        if bus.rp_s.shadow is not None:
+            bus.rp_s.shadow.reset_counters()
+        bus.settle.reset_counters()
+        count = 0
+        for i in range(32):
+            T.test()
+            count += 1
+            if T.error or T.last:
+                break
+        bus.pre_on(0)
+        elapsed = time.perf_counter() - start
+        return {
+            "board": name,
+            "tests": count,
+            "error": bool(T.error),
+            "elapsed": elapsed,
+            "tests_per_s": count / elapsed if elapsed else float("inf"),
+            "scpi_saved": bus.rp_s.shadow.saved if bus.rp_s.shadow is not None else 0,
+            "settle_saved": bus.settle.saved,
+        }
+
+    def run(self):
+        """Run all boards in parallel and return the per-board summaries."""
+        if not self.boards:
+            self.open()
+        start = time.perf_counter()
+        stdout = sys.stdout
+        sys.stdout = BoardOutput(stdout)
+        try:
+            with ThreadPoolExecutor(max_workers=len(self.boards)) as pool:
+                futures = [(b[0], pool.submit(self._run_board, *b)) for b in self.boards]
+                self.results = []
+                for name, f in futures:
+                    try:
+                        self.results.append(f.result())
+                    except Exception as e:
+                        self.results.append({"board": name, "error": True, "exception": repr(e)})
+        finally:
+            sys.stdout = stdout
+            self.elapsed = time.perf_counter() - start
+        return self.results
+
+    def _run_board(self, name, bus, T):
+        try:
+            return self.run_board(name, bus, T)
+        finally:
+            if isinstance(sys.stdout, BoardOutput):
+                sys.stdout.done()
+
+    def report(self):
+        """Combined result table, one row per board."""
+        frames = []
+        for name, bus, T in self.boards:
+            df = T.df.copy()
+            df.insert(0, "board", name)
+            frames.append(df)
+        return pd.concat(frames, ignore_index=True)
+
+    def print_summary(self):
+        for r in self.results:
+            if "exception" in r:
+                print(f'{r["board"]:<18}', "FAILED", r["exception"])
+                continue
+            state = "BAD" if r["error"] else "OK"
+            print(
+                f'{r["board"]:<18}',
+                f'{r["tests"]:>3} tests',
+                f'{r["elapsed"]:8.2f} s',
+                f'{r["tests_per_s"]:6.2f} tests/s',
+                f'{r["scpi_saved"]:5d} SCPI saved',
+                f'{r["settle_saved"]:6.2f} s settle saved',
+                state,
+            )
+        print(
+            f"{len(self.results)} boards in {self.elapsed:.2f} s,",
+            f"{len(self.results) * 3600 / self.elapsed:.0f} boards/h",
+        )
+
+    def save_log(self, path="dataset/station.csv"):
+        self.report().to_csv(path, mode="a", header=False, encoding="utf-8", index=False)
+
+    def close(self):
+        for name, bus, T in self.boards:
+            bus.rp_s.close()
+
+
+def load_config(path):
+    import yaml
+
+    with open(path) as f:
+        return yaml.safe_load(f)
+
+
+if __name__ == "__main__":
+    import sys
+
+    config = load_config(sys.argv[1] if len(sys.argv) > 1 else "station.yaml")
+    S = Station(config).open()
+    S.run()
+    S.print_summary()
+    print(S.report())
+    S.save_log()
+    S.close()
@@ -0,0 +1,211 @@
+"""Continuous acquisition into a host-side ring buffer.
+
+AcqStream keeps the Red Pitaya acquiring: the data queries of one capture and
+the re-arm commands of the next go out in one write, a producer thread copies
+every capture into a fixed (slots, channels, N) array and the consumer takes
+the blocks from a generator while the next one is acquired:
+
+    with rp_c.stream(quantity=4096, trig="CH1_PE") as s:
+        for block in s.blocks(100):
+            process(block[0], block[1])
+    print(s.report())
+
+A block stays valid until the next one is taken. When the consumer falls
+behind, the oldest unread block is overwritten and counted as an overrun.
+The connection must not be used by anyone else while the stream is running.
+"""
+
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# ring dtype per ACQ:DATA:UNITS
+BLOCK_DTYPE = {"VOLTS": np.float32, "RAW": np.int16}
+
+
+class AcqRing:
+    """Fixed-size ring of capture blocks with overrun accounting.
+
+    parameters:
+        slots    - number of blocks kept
+        channels - channels per block
+        quantity - samples per channel
+    """
+
+    def __init__(self, slots, channels, quantity, dtype=np.float32):
+        if slots < 2:
+            raise ValueError("ring needs at least 2 slots")
+        self.buff = np.zeros((slots, channels, quantity), dtype=dtype)
+        self.slots = slots
+        self.free = deque(range(slots))
+        self.unread = deque()
+        self.held = None  # slot handed to the consumer
+        self.produced = 0
+        self.consumed = 0
+        self.overruns = 0
+        self.cond = threading.Condition()
+
+    def reserve(self):
+        """Slot for the next block, drops the oldest unread one when the ring is full."""
+        with self.cond:
+            if self.free:
+                return self.free.popleft()
+            self.overruns += 1
+            return self.unread.popleft()
+
+    def commit(self, slot):
+        """Publish the block written into slot."""
+        with self.cond:
+            self.unread.append(slot)
+            self.produced += 1
+            self.cond.notify_all()
+
+    def _release(self):
+        if self.held is not None:
+            self.free.append(self.held)
+            self.held = None
+
+    def get(self, timeout=None):
+        """Oldest unread block (a view into the ring) or None on timeout.
+        The previously returned block is released.
+        """
+        with self.cond:
+            self._release()
+            if not self.cond.wait_for(lambda: self.unread, timeout):
+                return None
+            self.held = self.unread.popleft()
+            self.consumed += 1
+            return self.buff[self.held]
+
+    def release(self):
+        with self.cond:
+            self._release()
+
+
+class AcqStream:
+    """Auto re-arming acquisition on a RedCtl.
+
+    parameters:
+        rp_c     - RedCtl
+        quantity - samples per channel and block
+        channels - acquired channels
+        slots    - ring size in blocks
+        trig     - trigger source, "NOW", "CH1_PE", "EXT_NE" ...
+        threaded - acquire in a producer thread, otherwise blocks() acquires
+                   each block on demand
+    """
+
+    def __init__(self, rp_c, quantity=16384, channels=(1, 2), slots=8, trig="NOW", threaded=True):
+        self.rp_c = rp_c
+        self.rp_s = rp_c.rp_s
+        self.quantity = quantity
+        self.channels = tuple(channels)
+        self.trig = trig
+        self.threaded = threaded
+        self.units = self.rp_s.txrx_txt("ACQ:DATA:UNITS?")
+        self.ring = AcqRing(slots, len(self.channels), quantity, BLOCK_DTYPE[self.units])
+        self.error = None
+        self.elapsed = None
+        self._run = False
+        self._thread = None
+        self._start_time = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _arm(self):
+        self.rp_s.tx_txt("ACQ:START")
+        self.rp_s.tx_txt("ACQ:TRIG " + self.trig)
+
+    def acquire(self):
+        """Wait for the armed capture, copy it into the ring and re-arm in the same write."""
+        self.rp_c.trigger.wait()
+        slot = self.ring.reserve()
+        block = self.ring.buff[slot]
+        with self.rp_s.batch():
+            self.rp_s.acq_data_multi(self.channels, num_samples=self.quantity, old=True, out=block)
+            if self._run:
+                self._arm()
+        self.ring.commit(slot)
+        return block
+
+    def _produce(self):
+        try:
+            while self._run:
+                self.acquire()
+        except Exception as e:
+            self.error = e
+            with self.ring.cond:
+                self.ring.cond.notify_all()
+
+    def start(self):
+        self.rp_c.settle.wait()
+        with self.rp_s.batch():
+            self.rp_s.tx_txt("ACQ:DEC %d" % self.rp_c.dec)
+            self._arm()
+        self._run = True
+        self.error = None
+        self.elapsed = None
+        self._start_time = time.perf_counter()
+        if self.threaded:
+            self._thread = threading.Thread(target=self._produce, name="acq-stream", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._run = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.ring.release()
+        self.rp_s.tx_txt("ACQ:STOP")
+        self.elapsed = time.perf_counter() - self._start_time
+
+    def blocks(self, count=None, timeout=None):
+        """Yield (channels, quantity) blocks, count blocks or until stopped."""
+        if timeout is None:
+            timeout = self.rp_c.trigger.timeout
+        n = 0
+        while count is None or n < count:
+            if not self.threaded:
+                if not self._run:
+                    return
+                self.ring.release()
+                self.acquire()
+            block = self.ring.get(timeout)
+            if self.error is not None:
+                raise self.error
+            if block is None:
+                if not self._run:
+                    return
+                raise TimeoutError(f"no capture block within {timeout} s")
+            yield block
+            n += 1
+
+    def report(self):
+        elapsed = self.elapsed or (time.perf_counter() - self._start_time)
+        r = self.ring
+        return {
+            "blocks": r.produced,
+            "consumed": r.consumed,
+            "overruns": r.overruns,
+            "elapsed": elapsed,
+            "blocks_per_s": r.produced / elapsed if elapsed else 0.0,
+        }
+
+
+if __name__ == "__main__":
+    import redpctl
+    from scpi_sim import ScpiSim
+
+    with ScpiSim() as sim:
+        rp_c = redpctl.RedCtl(ip=sim.host, port=sim.port)
+        with rp_c.stream(quantity=4096, slots=4) as s:
+            for block in s.blocks(200):
+                rms = np.sqrt(np.mean(block**2, axis=1))
+        print(rms, s.report())
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from corner import find_corner
+
+
+def lowpass(fc, order=1):
+    """Attenuation in dB of order cascaded first order low-passes."""
+    return lambda f: 10 * order * np.log10(1 + (f / fc) ** 2)
+
+
+@pytest.mark.parametrize("order", [1, 2, 4])
+def test_corner_of_lowpass(order):
+    fc = 17.3e3
+    response = lowpass(fc, order)
+    exact = fc * np.sqrt(10 ** (6 / (10 * order)) - 1)
+    f, log = find_corner(response, 6, 10e3, 26e3, tol=10)
+    assert abs(f - exact) < 10
+    assert len(log) < 15
+    assert all(step in ("bracket", "secant", "bisect") for _, _, step in log)
+
+
+def test_corner_bracket_widened():
+    f, log = find_corner(lowpass(50e3), 3, 10e3, 20e3, tol=10)
+    assert abs(f - 50e3 * np.sqrt(10**0.3 - 1)) < 10
+    assert log[2][2] == "bracket"
+
+
+def test_corner_not_bracketed():
+    with pytest.raises(ValueError):
+        find_corner(lambda f: 0.0, 6, 10e3, 26e3, max_steps=6)
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+import signal_helper as sh
+from edges import EdgeDetector
+
+
+def pulses(seed=1, n=20000):
+    rng = np.random.default_rng(seed)
+    x = np.zeros(n)
+    for start in range(500, n - 1000, 1500):
+        x[start : start + rng.integers(5, 600)] = 0.5
+    return x + 0.03 * rng.standard_normal(n)
+
+
+@pytest.mark.parametrize("chunk", [1, 7, 100, 999, 20000])
+@pytest.mark.parametrize("min_width", [0, 20])
+def test_chunked_matches_whole(chunk, min_width):
+    x = pulses()
+    whole = EdgeDetector(0.3, 0.2, min_width)(x)
+    det = EdgeDetector(0.3, 0.2, min_width)
+    parts = [det(x[i : i + chunk]) for i in range(0, len(x), chunk)]
+    for k in range(2):
+        np.testing.assert_array_equal(np.concatenate([p[k] for p in parts]), whole[k])
+
+
+def test_hysteresis_and_min_width():
+    x = np.array([0, 0.3, 0.1, 0.3, 0.0, 1, 1, 1, 1, 0, 0])
+    rising, falling = EdgeDetector(0.25)(x)
+    assert list(rising) == [1, 3, 5] and list(falling) == [2, 4, 9]
+    rising, falling = EdgeDetector(0.25, 0.05)(x)
+    assert list(rising) == [1, 5] and list(falling) == [4, 9]
+    rising, falling = EdgeDetector(0.25, 0.05, min_width=4)(x)
+    assert list(rising) == [5] and list(falling) == [9]
+    det = EdgeDetector(0.25)
+    det.reset()
+    with pytest.raises(ValueError):
+        EdgeDetector(0.1, 0.2)
+
+
+def test_rising_falling_edge_as_convolution():
+    x = pulses(seed=2)
+    sign = x >= 0.3
+    np.testing.assert_array_equal(sh.rising_edge(x, 0.3)[0], np.flatnonzero(np.convolve(sign, [1, -1]) == 1))
+    np.testing.assert_array_equal(sh.falling_edge(x, 0.3)[0], np.flatnonzero(np.convolve(sign, [1, -1]) == -1))
+    x = np.array([0, 0.2, 0.3, 0.2, 0.1, 0.3])
+    assert list(sh.rising_edge(x, 0.2)[0]) == [1, 5]
+    assert list(sh.falling_edge(x, 0.2)[0]) == [4, 6]
+
+
+def test_x_edge_strict():
+    x = np.array([0, 0.2, 0.3, 0.1, 0.2, 0.0, 0.3, 0.0])
+    rising, falling = sh.x_edge(x, 0.2)
+    assert list(rising) == [6] and list(falling) == [3, 7]
+    # with hysteresis the detector state machine is used
+    rising, falling = sh.x_edge(x, 0.2, lo=0.05)
+    assert list(rising) == [1, 6] and list(falling) == [5, 7]
@@ -0,0 +1,56 @@
+import threading
+
+import pytest
+
+import gaincal
+
+
+class FakeAmp:
+    def __init__(self, offset=0.0):
+        self.offset = offset
+
+    def measure_gain_map(self, vin, freq):
+        gains = {0x11: 0.0, 0x22: -12.0, 0x26: -36.1, 0x33: -24.1, 0x77: -72.2}
+        return {k: v + self.offset for k, v in gains.items()}
+
+
+def test_gain_table_nearest_register():
+    table = gaincal.GainTable({0x11: 0.0, 0x22: -12.0, 0x33: -24.1})
+    assert table.register(-5.9) == 0x11
+    assert table.register(-6.1) == 0x22
+    assert table.register(-100) == 0x33
+    assert table.register(10) == 0x11
+    assert table.gain(-20) == pytest.approx(-24.1)
+
+
+def test_map_valid_only_for_vin_and_freq(tmp_path):
+    cal = gaincal.GainMap(FakeAmp(), path=str(tmp_path / "map.json"), station="st")
+    assert cal.gain("40", 0x26, 1e-3, 60e3) is None
+    with pytest.raises(KeyError):
+        cal.lookup("40", -36, 1e-3, 60e3)
+    cal.calibrate("40", 1e-3, 60e3)
+    assert cal.gain("40", 0x26, 1e-3, 60e3) == pytest.approx(-36.1)
+    assert cal.lookup("40", -35, 1e-3, 60e3) == 0x26
+    assert cal.gain("40", 0x26, 2e-3, 60e3) is None
+    assert cal.gain("40", 0x26, 1e-3, 26e3) is None
+
+    reloaded = gaincal.GainMap(FakeAmp(), path=str(tmp_path / "map.json"), station="st")
+    assert reloaded.gain("40", 0x26, 1e-3, 60e3) == pytest.approx(-36.1)
+    other = gaincal.GainMap(FakeAmp(), path=str(tmp_path / "map.json"), station="other")
+    assert other.gain("40", 0x26, 1e-3, 60e3) is None
+
+
+def test_concurrent_saves_keep_all_entries(tmp_path):
+    path = str(tmp_path / "map.json")
+    maps = [gaincal.GainMap(FakeAmp(i), path=path, station=f"st{i}") for i in range(8)]
+    threads = [threading.Thread(target=m.calibrate, args=("40", 1e-3, 60e3)) for m in maps]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    merged = gaincal.GainMap(FakeAmp(), path=path).load()
+    assert sorted(merged) == sorted(f"st{i}/40" for i in range(8))
+    assert list(tmp_path.glob("*.tmp")) == []
+
+    maps[0].invalidate("40")
+    assert sorted(gaincal.GainMap(FakeAmp(), path=path).load()) == sorted(f"st{i}/40" for i in range(1, 8))
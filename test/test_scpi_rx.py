@@ -0,0 +1,46 @@
+import redpitaya_scpi as scpi
+
+
+class ChunkScpi(scpi.scpi):
+    """scpi receiving the given chunks instead of socket data."""
+
+    def __init__(self, chunks, rx_bufsize=16):
+        self.chunks = list(chunks)
+        super().__init__("chunks", rx_bufsize=rx_bufsize)
+
+    def _connect(self):
+        pass
+
+    def _recv_into(self, view):
+        chunk = self.chunks.pop(0)
+        n = min(len(chunk), len(view))
+        view[:n] = chunk[:n]
+        if n < len(chunk):
+            self.chunks.insert(0, chunk[n:])
+        return n
+
+
+def test_rx_txt_delimiter_split_across_chunks():
+    rp_s = ChunkScpi([b"1.5,2", b".5\r", b"\nTD\r\n\r", b"\n"])
+    assert rp_s.rx_txt() == "1.5,2.5"
+    assert rp_s.rx_txt() == "TD"
+    assert rp_s.rx_txt() == ""
+
+
+def test_rx_txt_bare_cr_lf_inside_reply():
+    rp_s = ChunkScpi([b"a\rb\nc", b"\r\n"])
+    assert rp_s.rx_txt() == "a\rb\nc"
+
+
+def test_rx_txt_long_reply_grows_buffer():
+    text = ",".join(str(i * 0.001) for i in range(2000))
+    data = (text + "\r\n").encode()
+    rp_s = ChunkScpi([data[i : i + 700] for i in range(0, len(data), 700)])
+    assert rp_s.rx_txt() == text
+
+
+def test_rx_arb_then_rx_txt():
+    payload = bytes(range(40))
+    rp_s = ChunkScpi([b"#240" + payload[:10], payload[10:] + b"\r\nOK\r\n"])
+    assert bytes(rp_s.rx_arb()) == payload
+    assert rp_s.rx_txt() == "OK"
@@ -0,0 +1,47 @@
+import pytest
+
+from settle import Settle
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, s):
+        self.slept.append(s)
+        self.now += s
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_domains_run_out_in_parallel(clock):
+    s = Settle(clock, clock.sleep)
+    s.require("dac", 0.1)
+    s.require("power", 0.3)
+    s.require("dac", 0.05)  # merges into the later deadline
+    clock.now += 0.1
+    assert s.remaining("dac") == pytest.approx(0.0)
+    assert s.wait() == pytest.approx(0.2)
+    assert clock.slept == [pytest.approx(0.2)]
+    assert s.requested == pytest.approx(0.45)
+    assert s.saved == pytest.approx(0.25)
+
+
+def test_wait_only_named_domain(clock):
+    s = Settle(clock, clock.sleep)
+    s.require("i2c", 0.01)
+    s.require("gen", 2)
+    assert s.wait("i2c") == pytest.approx(0.01)
+    assert s.remaining() == pytest.approx(1.99)
+    clock.now += 5
+    assert s.wait() == 0
+    assert clock.slept == [pytest.approx(0.01)]
+    s.reset_counters()
+    assert s.saved == 0
@@ -0,0 +1,57 @@
+import pytest
+
+import redpitaya_scpi as scpi
+from scpi_sim import ScpiSim
+from shadow import ShadowState
+
+
+@pytest.fixture
+def board():
+    with ScpiSim() as sim:
+        rp_s = scpi.scpi(sim.host, port=sim.port)
+        rp_s.shadow = ShadowState()
+        yield sim, rp_s
+        rp_s.close()
+
+
+def sent(sim, cmd):
+    return sum(line == cmd for line in sim.log)
+
+
+def test_repeated_settings_are_dropped(board):
+    sim, rp_s = board
+    rp_s.tx_txt("ACQ:DEC 8")
+    rp_s.tx_txt("ACQ:DEC 8")
+    assert rp_s.txrx_txt("*IDN?").startswith("REDPITAYA")
+    assert sent(sim, "ACQ:DEC 8") == 1
+    assert rp_s.shadow.saved_writes == 1
+    assert rp_s.txrx_txt("ACQ:DEC?") == "8"
+    assert rp_s.shadow.saved_queries == 1
+
+
+def test_aborted_batch_forgets_queued_settings(board):
+    sim, rp_s = board
+    with pytest.raises(RuntimeError):
+        with rp_s.batch() as b:
+            b.tx_txt("ACQ:DEC 16")
+            raise RuntimeError("abort")
+    assert sent(sim, "ACQ:DEC 16") == 0
+    assert not rp_s.shadow.known("ACQ:DEC")
+
+    # the setting is sent again instead of being dropped as unchanged
+    with rp_s.batch() as b:
+        b.tx_txt("ACQ:DEC 16")
+        b.query("*IDN?")
+    assert sent(sim, "ACQ:DEC 16") == 1
+    assert rp_s.shadow.get("ACQ:DEC") == "16"
+
+
+def test_nested_batch_keeps_outer_queue(board):
+    sim, rp_s = board
+    with rp_s.batch() as outer:
+        outer.tx_txt("ACQ:DEC 4")
+        with rp_s.batch() as inner:
+            idx = inner.query("ACQ:DEC?")
+            inner.flush()
+        assert inner.responses[idx] == "4"
+    assert sent(sim, "ACQ:DEC 4") == 1
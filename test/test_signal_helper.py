@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+import signal_helper as sh
+
+
+def test_sequence_fills_awg_buffer():
+    t, signal = sh.gen_signals_sequence([250e3, 500e3], duration=0.001, size=16384)
+    assert len(signal) == 16384
+    assert t[1] == pytest.approx(0.002 / 16384)
+    # phase continuous, no step between the segments
+    assert np.max(np.abs(np.diff(signal))) < 2 * np.pi * 500e3 * t[1]
+
+
+def test_sequence_empty():
+    for size in (None, 16384):
+        t, signal = sh.gen_signals_sequence([], size=size)
+        assert t.size == 0 and signal.size == 0
+
+
+def test_sequence_out_checked():
+    out = np.empty(2000)
+    t, signal = sh.gen_signals_sequence([100e3, 200e3], duration=0.0001, out=out)
+    assert signal is out
+    with pytest.raises(ValueError):
+        sh.gen_signals_sequence([100e3], duration=0.0001, out=np.empty(10))
+
+
+def test_butter_sos_cached_for_list_and_array_cutoff():
+    sos = sh.butter_sos("band", (20e3, 80e3), 1e6, 4)
+    assert sh.butter_sos("band", [20e3, 80e3], 1e6, 4) is sos
+    assert sh.butter_sos("band", np.array([20e3, 80e3]), 1e6, 4) is sos
+    assert sh.butter_sos("low", 10e3, 1e6) is sh.butter_sos("low", np.float64(10e3), 1e6)
+
+
+def test_sos_stream_matches_whole_capture():
+    rng = np.random.default_rng(0)
+    x = rng.standard_normal((2, 5000))
+    sos = sh.butter_sos("low", 50e3, 1e6)
+    whole = sh.SOSStream(sos)(x)
+    stream = sh.SOSStream(sos)
+    chunks = np.concatenate([stream(x[:, i : i + 333]) for i in range(0, 5000, 333)], axis=1)
+    np.testing.assert_allclose(chunks, whole, atol=1e-12)
@@ -0,0 +1,50 @@
+import pandas as pd
+
+from settle import Settle
+from station import Station
+
+
+class FakeScpi:
+    shadow = None
+
+
+class FakeBus:
+    def __init__(self):
+        self.rp_s = FakeScpi()
+        self.settle = Settle()
+
+    def pre_on(self, value=1):
+        pass
+
+
+class FakeTests:
+    def __init__(self, name, fail=False):
+        self.name = name
+        self.fail = fail
+        self.error = False
+        self.last = False
+        self.df = pd.DataFrame(columns=["a"])
+
+    def test(self):
+        if self.fail:
+            raise RuntimeError("board lost")
+        for i in range(3):
+            print("result", i)
+        self.last = True
+
+
+def test_failing_board_is_recorded(capsys):
+    S = Station([])
+    S.boards = [
+        ("good", FakeBus(), FakeTests("good")),
+        ("bad", FakeBus(), FakeTests("bad", fail=True)),
+    ]
+    results = S.run()
+    assert results[0]["board"] == "good" and not results[0]["error"]
+    assert results[1] == {"board": "bad", "error": True, "exception": "RuntimeError('board lost')"}
+    assert S.elapsed > 0
+    S.print_summary()
+
+    out = capsys.readouterr().out.splitlines()
+    assert [line for line in out if "result" in line] == [f"{'good':<18} result {i}" for i in range(3)]
+    assert any(line.startswith("bad") and "FAILED" in line for line in out)
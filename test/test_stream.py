@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+import redpctl
+from scpi_sim import ScpiSim
+from stream import AcqRing
+
+
+def test_ring_overrun_drops_oldest():
+    ring = AcqRing(3, 1, 4)
+    for i in range(5):
+        slot = ring.reserve()
+        ring.buff[slot] = i
+        ring.commit(slot)
+    assert ring.overruns == 2
+    assert [ring.get(0)[0, 0] for i in range(3)] == [2, 3, 4]
+    assert ring.get(0) is None
+    with pytest.raises(ValueError):
+        AcqRing(1, 1, 4)
+
+
+@pytest.fixture
+def board():
+    sim = ScpiSim()
+    # every capture is constant, capture number plus channel / 10
+    sim.source = lambda chan, num: np.full(num, sim.captures + chan / 10)
+    with sim:
+        rp_c = redpctl.RedCtl(ip=sim.host, port=sim.port, dec=1)
+        yield sim, rp_c
+        rp_c.rp_s.close()
+
+
+def test_stream_on_demand_blocks_in_order(board):
+    sim, rp_c = board
+    with rp_c.stream(quantity=256, threaded=False) as s:
+        levels = [block[:, 0].copy() for block in s.blocks(4)]
+    # a new capture per block, both channels of the same capture
+    captures = np.round(np.array(levels)[:, 0] - 0.1)
+    assert np.all(np.diff(captures) >= 1)
+    for capture, level in zip(captures, levels):
+        np.testing.assert_allclose(level, [capture + 0.1, capture + 0.2], atol=1e-5)
+    assert s.report()["blocks"] == 4
+
+
+def test_stream_threaded(board):
+    sim, rp_c = board
+    with rp_c.stream(quantity=256, channels=(2,), slots=4) as s:
+        blocks = [block.copy() for block in s.blocks(6)]
+    assert all(b.shape == (1, 256) for b in blocks)
+    # every block is one whole capture of channel 2, the producer never goes back
+    starts = [b[0, 0] for b in blocks]
+    assert all(np.all(b == b[0, 0]) for b in blocks)
+    assert np.all(np.diff(starts) >= 1)
+    np.testing.assert_allclose(np.mod(starts, 1), 0.2, atol=1e-5)
+    r = s.report()
+    assert r["consumed"] == 6 and r["blocks"] >= 6
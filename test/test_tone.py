@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+import tone
+
+FS = 125e6 / 32
+F = 60e3
+
+
+def captures(ampl, noise, count=2000, periods=20, seed=1):
+    rng = np.random.default_rng(seed)
+    n = int(np.ceil(periods * FS / F))
+    t = np.arange(n) / FS
+    phase = rng.uniform(0, 2 * np.pi, (count, 1))
+    return ampl * np.cos(2 * np.pi * F * t + phase) + noise * rng.standard_normal((count, n)) + 0.05
+
+
+@pytest.mark.parametrize("noise", [1e-3, 1e-2])
+def test_sigma_matches_empirical_std(noise):
+    r = tone.ToneDetector(F, FS)(captures(0.3, noise))
+    assert np.all(r["sigma"] > 0)
+    assert np.mean(r["noise"]) == pytest.approx(noise, rel=0.02)
+    assert np.mean(r["sigma"]) == pytest.approx(np.std(r["amplitude"]), rel=0.1)
+    assert np.mean(r["amplitude"]) == pytest.approx(0.3, abs=3 * np.mean(r["sigma"]))
+
+
+def test_multiple_tones_and_scale():
+    n = 4096
+    t = np.arange(n) / FS
+    x = 0.2 * np.cos(2 * np.pi * 26e3 * t) + 0.1 * np.cos(2 * np.pi * 150e3 * t + 1.0)
+    r = tone.ToneDetector([26e3, 60e3, 150e3], FS)(x, scale=2.0)
+    assert r["amplitude"] == pytest.approx([0.4, 0.0, 0.2], abs=2e-3)
+    assert r["phase"][2] == pytest.approx(1.0, abs=1e-2)
+
+
+def test_tone_level_reuses_detector():
+    tone.detector.cache_clear()
+    x = captures(0.3, 1e-3, count=1)[0]
+    db = tone.tone_level(x, F, FS, ref=0.3 / np.sqrt(2))["db"]
+    tone.tone_level(x, F, FS)
+    assert db == pytest.approx(0, abs=0.01)
+    assert tone.detector.cache_info().hits == 1
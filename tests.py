@@ -11,6 +11,7 @@ from DAC70501 import DAC70501
 from DAT31R5A import Attenuator
 from vca import VCA
 from ADC import ADC
+from tone import capture, tone_level
 
 import signal_helper as sh
 import pandas as pd
@@ -128,7 +129,7 @@ class TESTs:
             self.bus.pre_on(1)
             self.bus.es_gl(0)
             self.bus.ss_gl(0)
-            time.sleep(0.5)
+            self.bus.settle.require("brd", 0.5)
             self.result = self.brd_noise()
 
         elif self.current == "ES_MAIN_GAIN_40":
@@ -186,12 +187,10 @@ class TESTs:
         self.bus.gen_on(0)
         brd = self.current.split("_")
         self.MUX.set_ch(self.s.join(brd[:2]))
-        time.sleep(0.1)
         self.DAC.init(brd[0])
         self.DAC.send_data(brd[0], "DAC_DATA", int(self.DAC.width) << 2)
-        self.data = self.bus.read_oneL0()
-        self.data = sh.voltage_divider_pre(self.data[0])
-        result = sh.rms(self.data)
+        self.data = self.bus.read_oneL0()[0]
+        result = sh.levels(self.data, sh.PRE_DIVIDER)["rms"]
         self.error = self.check_result(result)
         self.df.loc[0, [self.current]] = [result]
         return self.print_tests(result)
@@ -200,15 +199,14 @@ class TESTs:
         self.data = []
         brd = self.current.split("_")
         self.MUX.set_ch(self.s.join(brd[:2]))
-        time.sleep(0.1)
         self.bus.gen_on(1)
         self.DAC.init(brd[0])
-        self.bus.set_gen(wave_form="sine", freq=self.F[brd[0]][-1], ampl=0.1)
+        freq = self.F[brd[0]][-1]
+        self.bus.set_gen(wave_form="sine", freq=freq, ampl=0.1)
         self.DAC.send_data(brd[0], "DAC_DATA", self.VCA.vgain(int(brd[-1]), brd[0]))
-        self.data = self.bus.read_oneL0()
-        self.data = sh.voltage_divider_pre(self.data[0])
-        result = sh.rms(self.data)
-        result = sh.ratio_db(result, self.vin)
+        self.data = capture(self.bus, freq)
+        # level of the generator tone only, noise does not add to it
+        result = tone_level(self.data, freq, self.bus.fs, sh.PRE_DIVIDER, ref=self.vin)["db"]
         self.error = self.check_result(result)
         self.df.loc[0, [self.current]] = [result]
         return self.print_tests(result)
@@ -217,14 +215,12 @@ class TESTs:
         self.data = []
         brd = self.current.split("_")
         self.set_gl(brd[0], 1)
-        time.sleep(0.2)
-        self.data = self.bus.read_oneL0()
-        self.data = sh.voltage_divider_pre(self.data[0])
-        result = sh.rms(self.data)
-        result = sh.ratio_db(result, self.vin)
+        self.bus.settle.require("gl", 0.2)
+        self.data = self.bus.read_oneL0()[0]
+        result = sh.levels(self.data, sh.PRE_DIVIDER, ref=self.vin)["db"]
         self.error = self.check_result(result)
         self.set_gl(brd[0], 0)
-        time.sleep(0.2)
+        self.bus.settle.require("gl", 0.2)
         self.df.loc[0, [self.current]] = [result]
         return self.print_tests(result)
 
@@ -233,17 +229,14 @@ class TESTs:
         result = []
         brd = self.current.split("_")
         self.MUX.set_ch(self.s.join(brd[:2]))
-        time.sleep(0.1)
         self.bus.gen_on(1)
         self.DAC.init(brd[0])
         self.DAC.send_data(brd[0], "DAC_DATA", self.VCA.vgain(60))
         for i, value in enumerate(self.F[brd[0]]):
             self.bus.set_gen(wave_form="sine", freq=value, ampl=0.1)
-            time.sleep(0.1)
-            self.data = self.bus.read_oneL0()
-            self.data = sh.voltage_divider_pre(self.data[0])
-            result.append(sh.rms(self.data))
-            result[i] = sh.ratio_db(result[i], self.vin)
+            self.bus.settle.require("gen", 0.1)
+            self.data = self.bus.read_oneL0()[0]
+            result.append(sh.levels(self.data, sh.PRE_DIVIDER, ref=self.vin)["db"])
         self.error = self.check_result(result)
         self.df.loc[0, [self.current]] = [result]
         return self.print_tests(result)
@@ -253,7 +246,6 @@ class TESTs:
         self.bus.gen_on(0)
         self.DAC.init(brd[0])
         self.DAC.send_data(brd[0], "DAC_DATA", 0x0000)
-        time.sleep(0.1)
         for i in range(10):
             result = self.adc.read_data(self.s.join(brd[:2]))
         result = self.adc.code_volt(result)
@@ -336,4 +328,6 @@ if __name__ == "__main__":
             break
 
     rp_c.pre_on(0)
+    print(rp_c.shadow_report())
+    print(rp_c.settle.report())
     T.save_log()
@@ -0,0 +1,120 @@
+"""Lock-in amplitude and phase of known tones.
+
+The capture is demodulated with a windowed complex reference at every
+target frequency (a Goertzel/DFT bin at an arbitrary, not bin-centred
+frequency), one matrix product covers all tones and all captures of a batch.
+The Hann window keeps the leakage of a non-integer number of cycles and of
+the other tones low, so a few tens of periods give the level of the
+generator tone where a broadband RMS needs the noise averaged out:
+
+    tone = ToneDetector(60e3, rp_c.fs)
+    r = tone(capture(rp_c, 60e3), scale=sh.PRE_DIVIDER, ref=vin)
+    r["rms"], r["db"], r["phase"], r["sigma"]
+
+tone_level keeps one detector per (freq, fs), so repeated tests at the
+same generator frequency reuse the windowed references.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+from scipy.signal import get_window
+
+import signal_helper as sh
+
+
+class ToneDetector:
+    """IQ demodulator at fixed frequencies.
+
+    parameters:
+        freqs  - tone frequency in Hz or a sequence of them
+        fs     - sampling frequency of the captures (RedCtl.fs)
+        window - scipy window name, "boxcar" for bin-centred tones
+    """
+
+    def __init__(self, freqs, fs, window="hann"):
+        self.freqs = np.atleast_1d(np.asarray(freqs, dtype=float))
+        self.scalar = np.ndim(freqs) == 0
+        self.fs = fs
+        self.window = window
+        self.refs = {}
+
+    def reference(self, n):
+        """References for captures of n samples.
+
+        Returns the (tones, n) windowed demodulation references, the (tones, n)
+        unit phasors rebuilding the tones and the noise gain.
+        """
+        if n not in self.refs:
+            w = get_window(self.window, n, fftbins=False)
+            t = np.arange(n) / self.fs
+            phasor = np.exp(2j * np.pi * self.freqs[:, None] * t)
+            ref = np.conj(phasor) * (2 * w / w.sum())
+            # std of the amplitude estimate per unit of white noise std
+            gain = np.sqrt(2 * np.sum(w**2)) / w.sum()
+            self.refs[n] = ref, phasor, gain
+        return self.refs[n]
+
+    def __call__(self, x, scale=1.0, ref=None):
+        """Tone levels of the capture x (n,) or batch (..., n).
+
+        Returns a dict of arrays of shape (..., tones), or (...) for a single
+        frequency: amplitude (peak), rms, phase (cosine phase at the first
+        sample), noise (RMS of the residual after the tones and DC are removed),
+        sigma (standard deviation of amplitude) and db = ratio_db(rms, ref)
+        when ref is given. scale is a calibration factor applied to the results.
+        """
+        x = np.asarray(x, dtype=float)
+        n = x.shape[-1]
+        refs, phasor, gain = self.reference(n)
+        x = x - x.mean(axis=-1, keepdims=True)
+        z = x @ refs.T
+
+        # residual of the capture without the tones and its offset, degrees
+        # of freedom of the residual are n less DC and two per tone
+        residual = x - np.real(z @ phasor)
+        residual -= residual.mean(axis=-1, keepdims=True)
+        dof = max(n - 1 - 2 * len(self.freqs), 1)
+        noise = np.sqrt(np.sum(np.square(residual), axis=-1) / dof) * abs(scale)
+
+        z = z * scale
+        amplitude = np.abs(z)
+        sigma = noise[..., None] * gain * np.ones_like(amplitude)
+        result = {
+            "amplitude": amplitude,
+            "rms": amplitude / np.sqrt(2),
+            "phase": np.angle(z),
+            "noise": noise[..., None] * np.ones_like(amplitude),
+            "sigma": sigma,
+            "phase_sigma": sigma / np.maximum(amplitude, np.finfo(float).tiny),
+        }
+        if ref is not None:
+            result["db"] = sh.ratio_db(result["rms"], ref)
+        if self.scalar:
+            result = {k: v[..., 0] for k, v in result.items()}
+            if x.ndim == 1:
+                result = {k: float(v) for k, v in result.items()}
+        return result
+
+
+@lru_cache(maxsize=64)
+def detector(freq, fs, window="hann"):
+    """Shared ToneDetector, its references are reused by every measurement."""
+    return ToneDetector(freq, fs, window)
+
+
+def tone_level(x, freq, fs, scale=1.0, ref=None):
+    """Levels of the tone freq in x, see ToneDetector.__call__."""
+    return detector(float(freq), float(fs))(x, scale, ref)
+
+
+def capture(rp_c, freq, periods=20, ch=1):
+    """Start of an immediate capture holding periods of freq.
+
+    The length is bounded by a third of the buffer (read_oneL0), at dec=32
+    a 60 kHz tone needs 1302 samples instead of the full 16384 buffer.
+    """
+    n = int(np.ceil(periods * rp_c.fs / freq))
+    n = min(max(n, 256), rp_c.buffSize // 3)
+    t0 = -rp_c.buffTime / 2
+    return rp_c.read_window(t0, t0 + n / rp_c.fs, channels=(ch,), trig="NOW")[0]
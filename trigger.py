@@ -0,0 +1,122 @@
+"""Bounded-latency wait for the Red Pitaya acquisition trigger.
+
+TriggerWait replaces the ACQ:TRIG:STAT? / ACQ:TRIG:FILL? busy loops. Both
+status queries go out in one write, the poll interval follows the expected
+fill time of the buffer, a deadline turns a missing trigger into an error
+and the time to trigger is kept for a latency histogram.
+"""
+
+import time
+from collections import deque
+
+import numpy as np
+
+STRATEGIES = ("adaptive", "fixed", "busy")
+
+
+class TriggerWait:
+    """Trigger/fill poller for one scpi connection.
+
+    parameters:
+        rp_s         - scpi connection
+        buffTime     - acquisition time of one full buffer in s
+        timeout      - hard deadline of one wait in s
+        strategy     - "adaptive": first poll after the expected fill time, then
+                       back off by doubling up to max_interval
+                       "fixed": poll every interval s
+                       "busy": poll back-to-back (old behaviour, still bounded)
+        interval     - poll interval for "fixed", start interval for "adaptive"
+        max_interval - upper bound of the adaptive interval
+        history      - number of latencies kept for the histogram
+    """
+
+    def __init__(
+        self,
+        rp_s,
+        buffTime,
+        timeout=5.0,
+        strategy="adaptive",
+        interval=None,
+        max_interval=0.02,
+        history=10000,
+    ):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"strategy must be one of {STRATEGIES}")
+        self.rp_s = rp_s
+        self.buffTime = buffTime
+        self.timeout = timeout
+        self.strategy = strategy
+        self.interval = interval
+        self.max_interval = max_interval
+        self.latencies = deque(maxlen=history)
+        self.polls = 0
+        self.timeouts = 0
+
+    def poll(self):
+        """One round trip, returns (triggered, filled)."""
+        with self.rp_s.batch() as b:
+            b.query("ACQ:TRIG:STAT?")
+            b.query("ACQ:TRIG:FILL?")
+            b.flush()
+        self.polls += 1
+        stat, fill = b.responses
+        return stat == "TD", fill == "1"
+
+    def _first_interval(self):
+        if self.strategy == "busy":
+            return 0.0
+        if self.strategy == "fixed":
+            return self.interval if self.interval is not None else self.buffTime / 4
+        # after the trigger the post-trigger half of the buffer still has to fill
+        return min(self.buffTime / 2, self.max_interval)
+
+    def _next_interval(self, interval):
+        if self.strategy == "adaptive":
+            start = self.interval if self.interval is not None else self.buffTime / 8
+            return min(max(interval * 2, start), self.max_interval)
+        return interval
+
+    def wait(self, timeout=None):
+        """Block until the trigger fired and the buffer is filled, return the latency in s.
+        Raises TimeoutError when the deadline passes first.
+        """
+        if timeout is None:
+            timeout = self.timeout
+        start = time.perf_counter()
+        deadline = start + timeout
+        interval = self._first_interval()
+        if interval:
+            time.sleep(interval)
+
+        while True:
+            triggered, filled = self.poll()
+            now = time.perf_counter()
+            if triggered and filled:
+                latency = now - start
+                self.latencies.append(latency)
+                return latency
+            if now >= deadline:
+                self.timeouts += 1
+                state = "not filled" if triggered else "no trigger"
+                raise TimeoutError(f"ACQ trigger wait timed out after {timeout} s ({state})")
+            interval = self._next_interval(interval)
+            if interval:
+                time.sleep(min(interval, deadline - now))
+
+    def histogram(self, bins=20):
+        """Histogram of time-to-trigger, returns (counts, bin_edges) like np.histogram."""
+        return np.histogram(np.fromiter(self.latencies, dtype=float), bins=bins)
+
+    def stats(self):
+        lat = np.fromiter(self.latencies, dtype=float)
+        if lat.size == 0:
+            return {"waits": 0, "polls": self.polls, "timeouts": self.timeouts}
+        return {
+            "waits": lat.size,
+            "polls": self.polls,
+            "timeouts": self.timeouts,
+            "mean": float(np.mean(lat)),
+            "p50": float(np.percentile(lat, 50)),
+            "p99": float(np.percentile(lat, 99)),
+            "max": float(np.max(lat)),
+        }
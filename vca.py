@@ -34,24 +34,13 @@ class VCA:
             for i in gain:
                 self.DAC.send_data(k[:2], "DAC_DATA", self.vgain(i, k[:2]))
                 data.append(sh.voltage_divider_pre(rp_c.read_oneL0()[0]))
-                time.sleep(0.1)
             signal[k] = data
         return signal
 
     def signal_db(self, brd, signal, vin):
         for i in brd:
-            signal_max = []
-            for count, value in enumerate(signal[i]):
-                # signal_max.append(np.max(value))
-                signal_max.append(sh.rms(value))
-            signal[i] = signal_max
-
-        for i in brd:
-            ratio_db = []
-            count = len(signal[i])
-            for k in range(count):
-                ratio_db.append(sh.ratio_db(signal[i][k], vin))
-            signal[i] = ratio_db
+            # all captures of a board in one call
+            signal[i] = list(sh.levels(np.array(signal[i]), ref=vin)["db"])
         return signal
 
     def subtract_arr(self, dic, arr):